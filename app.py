@@ -15,40 +15,7 @@ logging.basicConfig(
     format='[%(asctime)s] %(levelname)s in %(module)s: %(message)s'
 )
 
-# Create Flask app
-app = Flask(__name__)
 
-# Load configuration
-config_class = get_config()
-app.config.from_object(config_class)
-
-# Ensure secret key is set
-if not app.config.get('SECRET_KEY') or app.config['SECRET_KEY'] == 'dev-secret-key-change-in-production':
-    print("Warning: Using default secret key. Set FLASK_SECRET_KEY in .env for production!")
-    if app.config.get('DEBUG'):
-        app.config['SECRET_KEY'] = 'dev-secret-key-for-development-only'
-    else:
-        raise ValueError("FLASK_SECRET_KEY must be set in production environment!")
-
-# Session configuration
-app.config['SESSION_COOKIE_SECURE'] = not app.config.get('DEBUG', False)  # HTTPS only in production
-app.config['SESSION_COOKIE_HTTPONLY'] = True
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-app.config['PERMANENT_SESSION_LIFETIME'] = app.config.get('SESSION_TIMEOUT', 3600)
-
-# Create upload folder if it doesn't exist
-upload_folder = app.config.get('UPLOAD_FOLDER', 'uploads')
-os.makedirs(upload_folder, exist_ok=True)
-
-# Initialize session manager and register error handlers
-from lib.session_manager import session_manager
-from lib.error_handlers import register_error_handlers
-
-session_manager.init_app(app)
-register_error_handlers(app)
-
-
-@app.route('/')
 def index():
     """Root endpoint - returns basic API info."""
     return jsonify({
@@ -66,7 +33,6 @@ def index():
     })
 
 
-@app.route('/health')
 def health_check():
     """Health check endpoint for monitoring."""
     return jsonify({
@@ -77,7 +43,6 @@ def health_check():
 
 
 # Error handlers
-@app.errorhandler(404)
 def not_found(error):
     """Handle 404 errors."""
     return jsonify({
@@ -86,7 +51,6 @@ def not_found(error):
     }), 404
 
 
-@app.errorhandler(500)
 def internal_error(error):
     """Handle 500 errors."""
     return jsonify({
@@ -95,7 +59,6 @@ def internal_error(error):
     }), 500
 
 
-@app.errorhandler(400)
 def bad_request(error):
     """Handle 400 errors."""
     return jsonify({
@@ -104,22 +67,81 @@ def bad_request(error):
     }), 400
 
 
-# Import and register blueprints (routes)
-# These will be uncommented as we create the route files
-from routes.upload import upload_bp
-app.register_blueprint(upload_bp, url_prefix='/api')
+def register_blueprints(app):
+    """
+    Import and register blueprints (routes).
+    Route modules pull in python-docx and the LLM client, so they are
+    imported here rather than at module load.
+    """
+    from routes.upload import upload_bp
+    app.register_blueprint(upload_bp, url_prefix='/api')
+
+    from routes.detect import detect_bp
+    app.register_blueprint(detect_bp, url_prefix='/api')
+
+    from routes.conversation import conversation_bp
+    app.register_blueprint(conversation_bp, url_prefix='/api')
+
+    from routes.preview import preview_bp
+    app.register_blueprint(preview_bp, url_prefix='/api')
+
+    from routes.download import download_bp
+    app.register_blueprint(download_bp, url_prefix='/api')
+
+
+def create_app(config_class=None):
+    """
+    Create and configure the Flask application.
+    
+    Args:
+        config_class: Configuration class to load (default: from FLASK_ENV)
+    
+    Returns:
+        Flask: Configured application instance
+    """
+    app = Flask(__name__)
+
+    # Load configuration
+    app.config.from_object(config_class or get_config())
+
+    # Ensure secret key is set
+    if not app.config.get('SECRET_KEY') or app.config['SECRET_KEY'] == 'dev-secret-key-change-in-production':
+        print("Warning: Using default secret key. Set FLASK_SECRET_KEY in .env for production!")
+        if app.config.get('DEBUG'):
+            app.config['SECRET_KEY'] = 'dev-secret-key-for-development-only'
+        else:
+            raise ValueError("FLASK_SECRET_KEY must be set in production environment!")
+
+    # Session configuration
+    app.config['SESSION_COOKIE_SECURE'] = not app.config.get('DEBUG', False)  # HTTPS only in production
+    app.config['SESSION_COOKIE_HTTPONLY'] = True
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.config['PERMANENT_SESSION_LIFETIME'] = app.config.get('SESSION_TIMEOUT', 3600)
+
+    # Create upload folder if it doesn't exist
+    upload_folder = app.config.get('UPLOAD_FOLDER', 'uploads')
+    os.makedirs(upload_folder, exist_ok=True)
+
+    # Initialize session manager and register error handlers
+    from lib.session_manager import session_manager
+    from lib.error_handlers import register_error_handlers
+
+    session_manager.init_app(app)
+    register_error_handlers(app)
+
+    app.add_url_rule('/', view_func=index)
+    app.add_url_rule('/health', view_func=health_check)
+    app.register_error_handler(404, not_found)
+    app.register_error_handler(500, internal_error)
+    app.register_error_handler(400, bad_request)
 
-from routes.detect import detect_bp
-app.register_blueprint(detect_bp, url_prefix='/api')
+    register_blueprints(app)
 
-from routes.conversation import conversation_bp
-app.register_blueprint(conversation_bp, url_prefix='/api')
+    return app
 
-from routes.preview import preview_bp
-app.register_blueprint(preview_bp, url_prefix='/api')
 
-from routes.download import download_bp
-app.register_blueprint(download_bp, url_prefix='/api')
+# Module-level app for `flask run`, gunicorn (app:app) and the test suite
+app = create_app()
 
 
 if __name__ == '__main__':
@@ -4,10 +4,14 @@ Loads environment variables and defines application constants.
 """
 
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file.
+# Deployments that inject the environment directly can set SKIP_DOTENV=1
+# to avoid searching for and parsing a .env file on every worker boot.
+if os.getenv('SKIP_DOTENV') != '1':
+    load_dotenv()
 
 
 class Config:
@@ -98,5 +102,11 @@ def get_config(env=None):
     if env is None:
         env = os.getenv('FLASK_ENV', 'development')
     
+    return _get_config_cached(env)
+
+
+@lru_cache(maxsize=4)
+def _get_config_cached(env):
+    """Resolve a configuration class by environment name (memoized)."""
     return config.get(env, config['default'])
 
@@ -4,8 +4,18 @@ Replaces placeholders in .docx documents with user-provided values
 """
 
 from docx import Document
+from docx.oxml.ns import qn
+from docx.table import _Cell
+import io
 import re
 import os
+import shutil
+import zipfile
+from bisect import bisect_right
+from copy import deepcopy
+from functools import lru_cache
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from config import Config
 import logging
 from lib.placeholder_detector import normalize_placeholder_name
@@ -13,6 +23,97 @@ from lib.placeholder_detector import normalize_placeholder_name
 logger = logging.getLogger(__name__)
 
 
+def _normalize_captured(match):
+    """Normalize the captured name of a delimited placeholder ({{x}}, {x}, [x])."""
+    return normalize_placeholder_name(match.group(match.lastgroup + '_name').strip())
+
+
+def _normalize_contextual(match):
+    """Underscore-based placeholders are normalized by _normalize_with_context."""
+    return None
+
+
+# Placeholder patterns, in the same priority order detection uses to arbitrate
+# overlapping matches (see detect_placeholders_with_context). They are fused into
+# one alternation below, so at any position the first alternative that matches
+# wins: {{X}} is never also read as {X}, and the underscores inside $[___] are
+# not matched a second time as a bare blank.
+#
+# Detection wraps each captured name in optional whitespace around a lazy group
+# ('\{\s*([...\s-]+?)\s*\}'). Both \s* and the class accept whitespace, so an
+# unclosed '{' followed by a long run of spaces or underscores backtracks
+# polynomially (seconds to minutes per paragraph). The closing delimiter is not
+# in the class, so a single greedy class matches exactly the same spans in linear
+# time; the surrounding whitespace ends up in the captured name and is stripped
+# by _normalize_captured.
+# Each entry is (pattern_name, regex_source, normalization_function).
+_PATTERNS = (
+    # $[_____] - matches detection exactly, renamed to dollar_underscore
+    ('dollar_underscore', r'\$\s*\[\s*_{3,}\s*\]', _normalize_contextual),
+    # [Placeholder Name] - matches detection exactly
+    ('square_bracket', r'\[\s*(?P<square_bracket_name>[A-Za-z][A-Za-z0-9_\s-]+)\]', _normalize_captured),
+    # {{PLACEHOLDER}} - matches detection exactly
+    ('double_curly', r'\{\{(?P<double_curly_name>[A-Za-z0-9_\s-]+)\}\}', _normalize_captured),
+    # {PLACEHOLDER} - matches detection exactly
+    ('single_curly', r'\{(?P<single_curly_name>[A-Za-z0-9_\s-]+)\}', _normalize_captured),
+    # _____ (3+ underscores) - normalization handled by _normalize_with_context
+    ('underscore', r'_{3,}', _normalize_contextual),
+)
+
+# Single compiled alternation; the matching kind is reported by match.lastgroup
+_PLACEHOLDER_RE = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern, _ in _PATTERNS))
+
+_NORMALIZERS = {name: normalizer for name, _, normalizer in _PATTERNS}
+
+# Every pattern above contains at least one of these characters, so text
+# without any of them cannot hold a placeholder
+_PLACEHOLDER_CHARS = frozenset('{[_')
+
+# Bare signature labels filled by _fill_signature_label (same labels as detection);
+# values are already canonical lookup keys
+_SIGNATURE_LABELS = {
+    'address:': 'address',
+    'email:': 'email',
+    'phone:': 'phone',
+    'by:': 'by',
+    'name:': 'name',
+    'title:': 'title',
+}
+# The same labels as one tuple, so a single str.endswith call checks them all
+_SIGNATURE_SUFFIXES = tuple(_SIGNATURE_LABELS)
+
+# Context labels for underscore blanks, as in detection: "Name: _____"
+_LABEL_BEFORE_COLON_RE = re.compile(r'([A-Za-z][A-Za-z0-9_\s-]{1,50})\s*:\s*$')
+# Labels for $[___] blanks: (the "Purchase Amount") after, or "Amount:" before
+_LABEL_AFTER_PAREN_RE = re.compile(r"\(\s*the\s+['\" ""]?([A-Za-z][A-Za-z0-9_\s-]{2,})['\" ""]?\s*\)", re.IGNORECASE)
+_LABEL_BEFORE_RE = re.compile(r'([A-Za-z][A-Za-z0-9_\s-]{2,50})\s*:?\s*$')
+_LABEL_STOPWORDS = frozenset({'of', 'the', 'a', 'an', 'is', 'at', 'on', 'by', 'for', 'in'})
+
+# Canonical keys tried, in order, when a context-dependent blank has no value
+_AMOUNT_SYNONYMS = ('purchase_amount', 'amount', 'price', 'amount_1')
+_BLANK_SYNONYMS = ('blank_1', 'blank', 'field_1', 'signatory_name', 'by', 'name', 'title', 'address', 'email', 'phone')
+
+# Declarations binding the WordprocessingML namespace in word/document.xml; group 1 is
+# the prefix ('w' in files written by Word, '' for a default namespace)
+_W_NAMESPACE_DECL_RE = re.compile(
+    r'xmlns(?::([\w.-]+))?\s*=\s*["\']http://schemas\.openxmlformats\.org/wordprocessingml/2006/main["\']'
+)
+
+# Matches a bare run of underscores (context-dependent placeholder)
+_UNDERSCORE_ONLY_RE = re.compile(r'^_{3,}$')
+
+# Per-instance override ids, as built by detection: '<locator>-s<start>-e<end>'
+_INSTANCE_ID_RE = re.compile(r'^(.+)-s(0|[1-9][0-9]*)-e(0|[1-9][0-9]*)$')
+
+# (prefix, suffix, pattern_type) for delimited placeholders, checked in order
+# so that '{{' wins over '{'
+_DELIMITERS = (
+    ('{{', '}}', 'double_curly'),
+    ('{', '}', 'single_curly'),
+    ('[', ']', 'square_bracket'),
+)
+
+
 class DocumentReplacementError(Exception):
     """Exception raised for errors during document replacement."""
     pass
@@ -27,6 +128,7 @@ def replace_placeholders(input_path, output_path, placeholder_values, overrides=
         input_path (str): Path to the input .docx file
         output_path (str): Path where the completed document will be saved
         placeholder_values (dict): Dictionary mapping placeholder names to their replacement values
+        overrides (dict): Optional per-instance overrides keyed by instance id
     
     Returns:
         str: Path to the completed document
@@ -35,55 +137,58 @@ def replace_placeholders(input_path, output_path, placeholder_values, overrides=
         DocumentReplacementError: If document processing fails
     """
     try:
-        logger.info(f"Loading document from: {input_path}")
-        doc = Document(input_path)
-        
         # Prepare lookup with flexible key normalization (case/spacing)
         lookup = _build_placeholder_lookup(placeholder_values)
-        try:
-            provided_keys = list((placeholder_values or {}).keys())
-            logger.info("Replacement input received: %d keys", len(provided_keys))
-            if provided_keys:
-                logger.debug("Input keys (first 20): %s", provided_keys[:20])
-        except Exception:
-            pass
-
-        # Compile all placeholder patterns
-        patterns = _compile_patterns()
-        
+        if isinstance(placeholder_values, dict):
+            logger.info("Replacement input received: %d keys", len(placeholder_values))
+            if placeholder_values and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Input keys (first 20): %s", list(placeholder_values)[:20])
+
+        # Nothing in the document can change: copy it without building the object graph
+        if not _may_contain_replacements(input_path, lookup):
+            logger.info(f"No placeholders in document; copying unchanged to: {output_path}")
+            _copy_document(input_path, output_path)
+            return output_path
+
+        logger.info(f"Loading document from: {input_path}")
+        doc = Document(input_path)
+
+        # Nothing to fill in: save the document without walking it
+        if not lookup and not overrides:
+            logger.info(f"No replacement values provided; saving document unchanged to: {output_path}")
+            _save_document(doc, output_path)
+            return output_path
+
         # Track replacements for logging
-        replacements_made = {}
+        replacements_made = Counter()
         
         # Track underscore counter across document (mutable reference)
         underscore_counter_ref = [0]
         
-        # Track existing normalized keys for counter logic (matches detection)
-        existing_keys = set()
+        # Track amount_* keys seen so far to number $[___] blanks (matches detection)
+        amount_keys = set()
         
-        # Process all paragraphs in the document (body-level)
-        for p_index, paragraph in enumerate(doc.paragraphs):
-            locator = f"p{p_index}"
-            _replace_in_paragraph(paragraph, patterns, lookup, replacements_made, overrides or {}, locator, underscore_counter_ref, existing_keys)
-        
-        # Process all tables in the document with stable locators
-        for ti, table in enumerate(doc.tables):
-            for ri, row in enumerate(table.rows):
-                for ci, cell in enumerate(row.cells):
-                    for pi, paragraph in enumerate(cell.paragraphs):
-                        locator = f"t{ti}-r{ri}-c{ci}-p{pi}"
-                        _replace_in_paragraph(paragraph, patterns, lookup, replacements_made, overrides or {}, locator, underscore_counter_ref, existing_keys)
-        
-        # Handle bare signature labels (e.g., "Address:" without explicit placeholder)
-        _fill_signature_labels(doc, lookup)
+        # Process all paragraphs (body-level, then tables) in document order.
+        # This must stay sequential: underscore/amount numbering depends on the
+        # order paragraphs are visited, and the counters above are shared state.
+        overrides_by_locator = _index_overrides(overrides)
+        fill_labels = _has_signature_values(lookup)
+        for locator, paragraph in _iter_all_paragraphs(doc):
+            text = _replace_in_paragraph(paragraph, lookup, replacements_made, overrides_by_locator.get(locator), locator,
+                                         underscore_counter_ref, amount_keys)
+            # Handle bare signature labels (e.g., "Address:" without explicit placeholder)
+            if fill_labels:
+                _fill_signature_label(paragraph, text, lookup)
 
         # Save the completed document
         logger.info(f"Saving completed document to: {output_path}")
-        doc.save(output_path)
+        _save_document(doc, output_path)
         
         # Log replacement summary
         logger.info(f"Document replacement complete. Replacements made: {len(replacements_made)}")
-        for placeholder, count in replacements_made.items():
-            logger.debug(f"  - '{placeholder}': {count} occurrence(s)")
+        if logger.isEnabledFor(logging.DEBUG):
+            for placeholder, count in replacements_made.most_common():
+                logger.debug("  - '%s': %d occurrence(s)", placeholder, count)
         
         return output_path
         
@@ -92,123 +197,200 @@ def replace_placeholders(input_path, output_path, placeholder_values, overrides=
         raise DocumentReplacementError(f"Failed to replace placeholders: {str(e)}")
 
 
-def _compile_patterns():
+def replace_placeholders_batch(jobs, max_workers=None):
+    """
+    Replace placeholders in several documents in parallel, one process per document.
+    Documents are independent and filling one is CPU-bound (XML parse, regex,
+    XML write), so worker processes sidestep the GIL.
+    
+    Args:
+        jobs (iterable): (input_path, output_path, placeholder_values[, overrides]) tuples
+        max_workers (int): Number of worker processes (default: CPU count)
+    
+    Returns:
+        list: Paths to the completed documents, in the same order as jobs
+    
+    Raises:
+        DocumentReplacementError: If processing any document fails
+    """
+    jobs = list(jobs)
+    # A pool only pays off when there is more than one document
+    if len(jobs) < 2 or max_workers == 1:
+        return [replace_placeholders(*job) for job in jobs]
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_replace_placeholders_job, jobs))
+
+
+def _replace_placeholders_job(job):
+    """Worker entry point for replace_placeholders_batch (must be picklable)."""
+    return replace_placeholders(*job)
+
+
+def _index_overrides(overrides):
     """
-    Compile all placeholder regex patterns.
-    Uses the same patterns and normalization logic as placeholder_detector.py.
+    Index per-instance overrides by paragraph locator, then by (start, end) span,
+    so matches are looked up without building an instance id string each time.
+    
+    Args:
+        overrides (dict): Overrides keyed by instance id ('<locator>-s<start>-e<end>')
     
     Returns:
-        list: List of tuples (pattern_name, compiled_regex, normalization_function)
-    """
-    patterns = []
-    
-    # Pattern 1: {{PLACEHOLDER}} - matches detection exactly
-    patterns.append((
-        'double_curly',
-        re.compile(r'\{\{\s*([A-Za-z0-9_\s-]+?)\s*\}\}'),
-        lambda m: normalize_placeholder_name(m.group(1).strip())
-    ))
-    
-    # Pattern 2: {PLACEHOLDER} - matches detection exactly
-    patterns.append((
-        'single_curly',
-        re.compile(r'\{\s*([A-Za-z0-9_\s-]+?)\s*\}'),
-        lambda m: normalize_placeholder_name(m.group(1).strip())
-    ))
-    
-    # Pattern 3: [Placeholder Name] - matches detection exactly
-    patterns.append((
-        'square_bracket',
-        re.compile(r'\[\s*([A-Za-z][A-Za-z0-9_\s-]+?)\s*\]'),
-        lambda m: normalize_placeholder_name(m.group(1).strip())
-    ))
-    
-    # Pattern 4: _____ (3+ underscores) - normalization handled by _normalize_with_context
-    patterns.append((
-        'underscore',
-        re.compile(r'_{3,}'),
-        lambda m: None  # Will be normalized by _normalize_with_context
-    ))
-    
-    # Pattern 5: $[_____] - matches detection exactly, renamed to dollar_underscore
-    patterns.append((
-        'dollar_underscore',
-        re.compile(r'\$\s*\[\s*_{3,}\s*\]'),
-        lambda m: None  # Will be normalized by _normalize_with_context
-    ))
-    
-    # Note: bracket_underscore pattern removed to match detection
-    
-    return patterns
+        dict: {locator: {(start, end): answer}} for overrides that have an answer
+    """
+    index = {}
+    for instance_id, inst in (overrides or {}).items():
+        if not inst or not inst.get('answer'):
+            continue
+        id_match = _INSTANCE_ID_RE.match(str(instance_id))
+        if not id_match:
+            continue
+        locator, start, end = id_match.groups()
+        index.setdefault(locator, {})[(int(start), int(end))] = inst['answer']
+    return index
+
+
+def _may_contain_replacements(input_path, lookup):
+    """
+    Pre-scan the raw word/document.xml text for anything replace_placeholders
+    could change, without parsing the document with python-docx.
+    
+    Returns:
+        bool: False only if no text contains a placeholder delimiter and no
+              signature label value was provided. True whenever the scan cannot
+              find the text (missing part or namespace binding, no text runs),
+              so the caller falls back to the full parse
+    """
+    with zipfile.ZipFile(input_path) as package:
+        try:
+            xml = package.read('word/document.xml').decode('utf-8', 'ignore')
+        except KeyError:
+            return True
+    
+    # Text runs are <prefix:t> for whichever prefix binds the WordprocessingML namespace
+    prefixes = set(_W_NAMESPACE_DECL_RE.findall(xml))
+    if not prefixes:
+        return True
+    texts = [text for prefix in prefixes for text in _xml_text_re(prefix).findall(xml)]
+    if not texts:
+        return True
+    
+    if not _PLACEHOLDER_CHARS.isdisjoint(''.join(texts)):
+        return True
+    return _has_signature_values(lookup)
+
+
+@lru_cache(maxsize=None)
+def _xml_text_re(prefix):
+    """Compiled regex for the text of <prefix:t> elements ('' for the default namespace)."""
+    tag = re.escape(f'{prefix}:t' if prefix else 't')
+    return re.compile(rf'<{tag}(?:\s[^>]*)?>([^<]*)</{tag}>')
+
+
+def _has_signature_values(lookup):
+    """Return True if any bare signature label has a value to fill in."""
+    return any(lookup.get(key) for key in _SIGNATURE_LABELS.values())
+
+
+def _copy_document(input_path, output_path):
+    """Copy a document to output_path atomically (see _save_document)."""
+    tmp_path = output_path + '.tmp'
+    try:
+        shutil.copyfile(input_path, tmp_path)
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _save_document(doc, output_path):
+    """
+    Save a document atomically: serialize in memory, write a temporary file
+    next to the target, then rename it into place so readers never see a
+    partially written .docx.
+    """
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    tmp_path = output_path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(buffer.getbuffer())
+        os.replace(tmp_path, output_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _iter_all_paragraphs(doc):
+    """
+    Yield (locator, paragraph) for body paragraphs, then table cell paragraphs.
+    Locators match those emitted by detect_placeholders_with_context.
+    """
+    for p_index, paragraph in enumerate(doc.paragraphs):
+        yield f"p{p_index}", paragraph
+    for ti, table in enumerate(doc.tables):
+        for ri, ci, cell in _iter_table_cells(table):
+            for pi, paragraph in enumerate(cell.paragraphs):
+                yield f"t{ti}-r{ri}-c{ci}-p{pi}", paragraph
+
+
+def _iter_table_cells(table):
+    """
+    Yield (row_index, cell_index, cell) in the same order as table.rows -> row.cells.
+    
+    row.cells checks every <w:tc> for horizontal and vertical merges, which dominates
+    traversal of large tables. When the table has no merged cells at all, each <w:tc>
+    is exactly one cell, so the elements are wrapped directly.
+    """
+    tbl = table._tbl
+    if tbl.xpath('.//w:gridSpan | .//w:vMerge'):
+        for ri, row in enumerate(table.rows):
+            for ci, cell in enumerate(row.cells):
+                yield ri, ci, cell
+        return
+    for ri, tr in enumerate(tbl.tr_lst):
+        for ci, tc in enumerate(tr.tc_lst):
+            yield ri, ci, _Cell(tc, table)
+
+
+def _canonical_key(key):
+    """
+    Canonical form used for value lookups: case-insensitive and
+    space/underscore-insensitive (e.g. 'Company Name' -> 'company_name').
+    """
+    return str(key).strip().lower().replace(' ', '_')
 
 
 def _build_placeholder_lookup(placeholder_values):
     """
-    Build a flexible lookup dictionary that allows case-insensitive and
-    space/underscore-insensitive access to placeholder values.
+    Build a lookup dictionary keyed by the canonical form of each placeholder
+    name, so that case and space/underscore differences do not matter.
+    Keys are canonicalized once per document rather than per match.
     """
     if not isinstance(placeholder_values, dict):
         return {}
 
-    lookup = {}
-    for key, value in placeholder_values.items():
-        if key is None:
-            continue
-        variants = set()
-        k1 = str(key)
-        variants.add(k1)
-        variants.add(k1.upper())
-        variants.add(k1.lower())
-        variants.add(k1.replace(' ', '_'))
-        variants.add(k1.replace('_', ' '))
-        variants.add(k1.title())
-        variants.add(k1.lower().replace(' ', '_'))
-        variants.add(k1.upper().replace(' ', '_'))
-        for v in variants:
-            lookup[v] = value
-        try:
-            # Log a compact view of variants per key to aid debugging
-            sample = sorted(list(variants))[:8]
-            logger.debug("Lookup variants for key '%s' (showing up to 8/%d): %s", k1, len(variants), sample)
-        except Exception:
-            pass
+    lookup = {_canonical_key(key): value for key, value in placeholder_values.items() if key is not None}
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Lookup built with %d canonical keys (first 20): %s", len(lookup), list(lookup)[:20])
     return lookup
 
 
 def _resolve_value(lookup, normalized):
     """
-    Resolve a replacement value from the lookup using multiple variants of the key.
+    Resolve a replacement value from the lookup by the canonical form of the key.
     """
-    if normalized in lookup:
-        try:
-            logger.debug("Resolved key '%s' via direct match", normalized)
-        except Exception:
-            pass
-        return lookup[normalized]
-    variants = [
-        normalized.upper(),
-        normalized.lower(),
-        normalized.replace(' ', '_'),
-        normalized.replace('_', ' '),
-        normalized.title(),
-        normalized.lower().replace(' ', '_'),
-        normalized.upper().replace(' ', '_')
-    ]
-    for v in variants:
-        if v in lookup:
-            try:
-                logger.debug("Resolved key '%s' via variant '%s'", normalized, v)
-            except Exception:
-                pass
-            return lookup[v]
-    try:
-        logger.info("No value found for normalized key '%s'", normalized)
-    except Exception:
-        pass
+    value = lookup.get(_canonical_key(normalized))
+    if value is not None:
+        logger.debug("Resolved key '%s'", normalized)
+        return value
+    logger.info("No value found for normalized key '%s'", normalized)
     return None
 
 
-def _normalize_with_context(text, match, pattern_name, underscore_counter_ref, existing_keys):
+def _normalize_with_context(text, match, pattern_name, underscore_counter_ref, amount_keys):
     """
     For underscore-based placeholders, try to infer a meaningful key using
     nearby context, matching detection logic exactly from placeholder_detector.py.
@@ -218,7 +400,7 @@ def _normalize_with_context(text, match, pattern_name, underscore_counter_ref, e
         match: Regex match object
         pattern_name: Pattern type ('underscore' or 'dollar_underscore')
         underscore_counter_ref: List with single int to track counter (mutable reference)
-        existing_keys: Set of already-seen normalized keys for counter logic
+        amount_keys: Set of already-seen amount_* keys for counter logic
     
     Returns:
         Normalized placeholder key
@@ -226,7 +408,7 @@ def _normalize_with_context(text, match, pattern_name, underscore_counter_ref, e
     if pattern_name == 'underscore':
         # Try to extract label before underscores: "Name: _____"
         before = (text[:match.start()] or '').strip()
-        label_m = re.search(r'([A-Za-z][A-Za-z0-9_\s-]{1,50})\s*:\s*$', before)
+        label_m = _LABEL_BEFORE_COLON_RE.search(before)
         if label_m:
             return normalize_placeholder_name(label_m.group(1))
         else:
@@ -237,23 +419,20 @@ def _normalize_with_context(text, match, pattern_name, underscore_counter_ref, e
     elif pattern_name == 'dollar_underscore':
         # Try to find a descriptive label AFTER the brackets: (the "Purchase Amount")
         after_text = text[match.end():match.end()+100]
-        after_label = re.search(r"\(\s*the\s+['\" ""]?([A-Za-z][A-Za-z0-9_\s-]{2,})['\" ""]?\s*\)", after_text, re.IGNORECASE)
+        after_label = _LABEL_AFTER_PAREN_RE.search(after_text)
         if after_label:
             return normalize_placeholder_name(after_label.group(1))
         else:
             # Otherwise, try label immediately before the brackets
             before = (text[:match.start()] or '').strip()
-            label_m = re.search(r'([A-Za-z][A-Za-z0-9_\s-]{2,50})\s*:?\s*$', before)
-            stopwords = {'of', 'the', 'a', 'an', 'is', 'at', 'on', 'by', 'for', 'in'}
-            if label_m and label_m.group(1).strip().lower() not in stopwords:
+            label_m = _LABEL_BEFORE_RE.search(before)
+            if label_m and label_m.group(1).strip().lower() not in _LABEL_STOPWORDS:
                 return normalize_placeholder_name(label_m.group(1))
             else:
                 # Default to amount_N pattern - match detection logic exactly
-                base = 'amount'
                 # Count existing amount_* keys like detection does
-                existing_count = len([k for k in existing_keys if k.startswith(base + '_')])
-                normalized = f"{base}_{existing_count + 1}"
-                existing_keys.add(normalized)
+                normalized = f"amount_{len(amount_keys) + 1}"
+                amount_keys.add(normalized)
                 return normalized
     
     # Fallback (shouldn't reach here)
@@ -261,197 +440,212 @@ def _normalize_with_context(text, match, pattern_name, underscore_counter_ref, e
     return f"field_{underscore_counter_ref[0]}"
 
 
-def _fill_signature_labels(doc, lookup):
-    """
-    Fill common signature block labels when no explicit placeholder markup exists.
-    For paragraphs that end with e.g. "Address:" or "Email:", append the provided value.
-    Matches detection signature_label handling (normalizes using normalize_placeholder_name).
-    """
-    # Use same labels as detection
-    signature_labels = {
-        'address:': 'address',
-        'email:': 'email',
-        'phone:': 'phone',
-        'by:': 'by',
-        'name:': 'name',
-        'title:': 'title',
-    }
-
-    def process_para(paragraph):
-        text = paragraph.text or ''
-        stripped = text.strip()
-        low = stripped.lower()
-        # Check if it matches signature label pattern (ends with label:)
-        for label_key, normalized_label in signature_labels.items():
-            if low.endswith(label_key):
-                # Use normalized label for lookup (matches detection)
-                normalized_key = normalize_placeholder_name(normalized_label)
-                value = _resolve_value(lookup, normalized_key)
-                if value:
-                    # Append a space and the value, preserving existing formatting strategy
-                    new_text = text + ' ' + value
-                    _update_paragraph_text(paragraph, new_text, text, paragraph.runs)
-                    try:
-                        logger.info("Filled signature label '%s' (normalized=%s) with provided value", label_key, normalized_key)
-                    except Exception:
-                        pass
-                break
-
-    for paragraph in doc.paragraphs:
-        process_para(paragraph)
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    process_para(paragraph)
+def _fill_signature_label(paragraph, text, lookup):
+    """
+    Fill a common signature block label when no explicit placeholder markup exists.
+    If the paragraph ends with e.g. "Address:" or "Email:", append the provided value.
+    Matches detection signature_label handling.
+    
+    Args:
+        paragraph: docx.paragraph.Paragraph object
+        text: The paragraph's current text (after placeholder replacement)
+        lookup: Canonical placeholder lookup
+    """
+    low = text.rstrip().lower()
+    # Check if it matches signature label pattern (ends with label:)
+    if not low.endswith(_SIGNATURE_SUFFIXES):
+        return
+    # Find which label matched (only reached for actual signature lines)
+    for label_key, normalized_key in _SIGNATURE_LABELS.items():
+        if low.endswith(label_key):
+            value = lookup.get(normalized_key)
+            if value:
+                # Append a space and the value, preserving existing formatting strategy
+                new_text = text + ' ' + value
+                _update_paragraph_text(paragraph, new_text, text, paragraph.runs)
+                logger.info("Filled signature label '%s' (normalized=%s) with provided value", label_key, normalized_key)
+            break
 
 
-def _replace_in_paragraph(paragraph, patterns, placeholder_values, replacements_made, overrides, locator: str, underscore_counter_ref, existing_keys):
+def _replace_in_paragraph(paragraph, placeholder_values, replacements_made, overrides, locator: str, underscore_counter_ref, amount_keys):
     """
     Replace placeholders in a single paragraph, preserving formatting.
     Works at the run level to maintain character formatting.
     
     Args:
         paragraph: docx.paragraph.Paragraph object
-        patterns: List of compiled regex patterns
         placeholder_values: Dictionary of placeholder -> value mappings
-        replacements_made: Dictionary to track replacement counts
-        overrides: Dictionary of per-instance overrides
+        replacements_made: Counter tracking replacement counts per normalized key
+        overrides: This paragraph's override answers keyed by (start, end), or None
         locator: String identifier for this paragraph location
         underscore_counter_ref: List with single int to track underscore counter (mutable reference)
-        existing_keys: Set of already-seen normalized keys for counter logic
+        amount_keys: Set of already-seen amount_* keys for counter logic
+    
+    Returns:
+        str: The paragraph text after replacement
     """
-    # Get full paragraph text
+    # Get full paragraph text (computed from the XML on each access, so read it once)
     full_text = paragraph.text
     
     if not full_text:
-        return
-    
-    # Check if any placeholder patterns exist in this paragraph
-    has_placeholders = False
-    for pattern_name, regex, normalizer in patterns:
-        if regex.search(full_text):
-            has_placeholders = True
-            break
+        return full_text
     
-    if not has_placeholders:
-        return
+    # Cheap prefilter: most paragraphs are plain prose and never reach the regex
+    if _PLACEHOLDER_CHARS.isdisjoint(full_text):
+        return full_text
     
-    # Build a map of character positions to runs
+    debug = logger.isEnabledFor(logging.DEBUG)
+
+    # Resolve all matches in a single pass over the paragraph text
+    replacements = []  # List of (start_pos, end_pos, replacement_text)
+    add_replacement = replacements.append
+    for match in _PLACEHOLDER_RE.finditer(full_text):
+        normalized, replacement_value = _resolve_match(
+            full_text, match, placeholder_values, overrides, locator, underscore_counter_ref, amount_keys
+        )
+        start, end = match.span()
+        if replacement_value is None:
+            logger.info("No replacement value for normalized=%s at %s [%d:%d] pattern=%s",
+                        normalized, locator, start, end, match.lastgroup)
+            continue
+
+        if debug:
+            logger.debug("Planned replacement at %s [%d:%d] normalized=%s value_len=%d",
+                         locator, start, end, normalized, len(replacement_value))
+        add_replacement((start, end, replacement_value))
+
+        # Track replacement counts
+        replacements_made[normalized] += 1
+
+    if not replacements:
+        return full_text
+
+    # paragraph.runs walks the XML again; only fetch it once there is something to replace
     runs = paragraph.runs
     if not runs:
-        return
+        return full_text
+
+    # Edit runs in place when every placeholder sits inside a single run, which keeps
+    # the formatting of all runs; otherwise collapse the paragraph into one run.
+    new_text = _splice_text(full_text, replacements)
+    if not _replace_within_runs(runs, full_text, replacements):
+        _update_paragraph_text(paragraph, new_text, full_text, runs)
+        # Content outside plain runs (e.g. hyperlinks) is kept, so re-read the text
+        new_text = paragraph.text
+    if debug:
+        logger.debug("Applied %d replacement(s) in %s", len(replacements), locator)
+    return new_text
+
+
+def _splice_text(text, replacements):
+    """
+    Apply (start, end, value) replacements, sorted by start, to text in one forward pass.
+    """
+    parts = []
+    cursor = 0
+    for start, end, value in replacements:
+        parts.append(text[cursor:start])
+        parts.append(value)
+        cursor = end
+    parts.append(text[cursor:])
+    return ''.join(parts)
+
+
+def _replace_within_runs(runs, full_text, replacements):
+    """
+    Apply replacements by editing the text of individual runs.
     
-    # Create a working copy of the text
-    working_text = full_text
+    Args:
+        runs: The paragraph's runs
+        full_text: The paragraph text the replacement offsets refer to
+        replacements: List of (start, end, value) tuples sorted by start
     
-    # Perform replacements on working text
-    replacements = []  # List of (start_pos, end_pos, replacement_text, normalized_key)
+    Returns:
+        bool: True if applied; False (nothing modified) if a placeholder straddles
+              a run boundary or the paragraph text is not made up of its runs alone
+    """
+    run_texts = [run.text for run in runs]
+    offsets = [0]
+    for text in run_texts:
+        offsets.append(offsets[-1] + len(text))
+    if offsets[-1] != len(full_text):
+        # Paragraph text includes content outside plain runs (e.g. hyperlinks)
+        return False
+
+    per_run = {}
+    for start, end, value in replacements:
+        index = bisect_right(offsets, start) - 1
+        if end > offsets[index + 1]:
+            return False
+        base = offsets[index]
+        per_run.setdefault(index, []).append((start - base, end - base, value))
+
+    for index, run_replacements in per_run.items():
+        runs[index].text = _splice_text(run_texts[index], run_replacements)
+    return True
+
+
+def _resolve_match(full_text, match, placeholder_values, overrides, locator, underscore_counter_ref, amount_keys):
+    """
+    Resolve the normalized key and replacement value for a single placeholder match.
     
-    # Find all matches across all patterns
-    for pattern_name, regex, normalizer in patterns:
-        for match in regex.finditer(full_text):
-            # Normalize the placeholder name; enhance with context for underscore-based patterns
-            if pattern_name in ('dollar_underscore', 'underscore'):
-                normalized = _normalize_with_context(full_text, match, pattern_name, underscore_counter_ref, existing_keys)
-            else:
-                # For patterns with captured groups, use the normalizer
-                normalized = normalizer(match)
-                # Track normalized keys
-                if normalized:
-                    existing_keys.add(normalized)
-            
-            if normalized is None:
-                # Fallback if normalizer returned None
-                normalized = 'placeholder'
-            
-            try:
-                snippet = full_text[max(0, match.start()-20):min(len(full_text), match.end()+20)]
-                logger.debug("Detected match at %s [%d:%d] pattern=%s normalized=%s snippet=%r",
-                             locator, match.start(), match.end(), pattern_name, normalized, snippet)
-            except Exception:
-                pass
-            
-            # Look up the replacement value
-            replacement_value = _resolve_value(placeholder_values, normalized)
-
-            # Apply per-instance override if provided and available
-            if overrides:
-                instance_id = f"{locator}-s{match.start()}-e{match.end()}"
-                inst = overrides.get(instance_id)
-                if inst and inst.get('answer'):
-                    replacement_value = inst['answer']
-                    try:
-                        logger.info("Override applied for instance %s (normalized=%s)", instance_id, normalized)
-                    except Exception:
-                        pass
-            
-            # Fallbacks for common synonyms/prefixes (matching detection behavior)
-            if replacement_value is None and pattern_name == 'dollar_underscore':
-                for key in ['purchase_amount', 'amount', 'price', 'amount_1']:
-                    replacement_value = _resolve_value(placeholder_values, key)
-                    if replacement_value is not None:
-                        try:
-                            logger.debug("Resolved '%s' via amount synonym '%s'", normalized, key)
-                        except Exception:
-                            pass
-                        break
-            if replacement_value is None and pattern_name == 'underscore':
-                for key in ['blank_1', 'blank', 'field_1', 'signatory_name', 'by', 'name', 'title', 'address', 'email', 'phone']:
-                    replacement_value = _resolve_value(placeholder_values, key)
-                    if replacement_value is not None:
-                        try:
-                            logger.debug("Resolved '%s' via blank/signature synonym '%s'", normalized, key)
-                        except Exception:
-                            pass
-                        break
-            
+    Returns:
+        tuple: (normalized_key, replacement_value or None)
+    """
+    pattern_name = match.lastgroup
+    # Normalize the placeholder name; enhance with context for underscore-based patterns
+    if pattern_name in ('dollar_underscore', 'underscore'):
+        normalized = _normalize_with_context(full_text, match, pattern_name, underscore_counter_ref, amount_keys)
+    else:
+        # For patterns with captured groups, use the normalizer
+        normalized = _NORMALIZERS[pattern_name](match)
+        # Track amount_* keys so generated amount_N names continue after them
+        if normalized and normalized.startswith('amount_'):
+            amount_keys.add(normalized)
+    
+    if normalized is None:
+        # Fallback if normalizer returned None
+        normalized = 'placeholder'
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        snippet = full_text[max(0, match.start()-20):match.end()+20]
+        logger.debug("Detected match at %s [%d:%d] pattern=%s normalized=%s snippet=%r",
+                     locator, match.start(), match.end(), pattern_name, normalized, snippet)
+    
+    # Look up the replacement value
+    replacement_value = _resolve_value(placeholder_values, normalized)
+
+    # Apply per-instance override if provided and available
+    if overrides:
+        span = match.span()
+        answer = overrides.get(span)
+        if answer:
+            replacement_value = answer
+            logger.info("Override applied for instance %s-s%d-e%d (normalized=%s)", locator, *span, normalized)
+    
+    # Fallbacks for common synonyms/prefixes (matching detection behavior)
+    if replacement_value is None and pattern_name == 'dollar_underscore':
+        for key in _AMOUNT_SYNONYMS:
+            replacement_value = placeholder_values.get(key)
             if replacement_value is not None:
-                # Record the replacement
-                start = match.start()
-                end = match.end()
-                replacements.append((start, end, replacement_value, normalized))
-                try:
-                    logger.debug("Planned replacement at %s [%d:%d] normalized=%s value_len=%d",
-                                 locator, start, end, normalized, len(replacement_value))
-                except Exception:
-                    pass
-            else:
-                try:
-                    logger.info("No replacement value for normalized=%s at %s [%d:%d] pattern=%s",
-                                normalized, locator, match.start(), match.end(), pattern_name)
-                except Exception:
-                    pass
-    
-    # Sort replacements by position (reverse order to handle offsets correctly)
-    replacements.sort(key=lambda x: x[0], reverse=True)
-    
-    # Apply replacements to working text
-    for start, end, replacement_value, normalized in replacements:
-        working_text = working_text[:start] + replacement_value + working_text[end:]
-        
-        # Track replacement counts
-        if normalized in replacements_made:
-            replacements_made[normalized] += 1
-        else:
-            replacements_made[normalized] = 1
+                logger.debug("Resolved '%s' via amount synonym '%s'", normalized, key)
+                break
+    if replacement_value is None and pattern_name == 'underscore':
+        for key in _BLANK_SYNONYMS:
+            replacement_value = placeholder_values.get(key)
+            if replacement_value is not None:
+                logger.debug("Resolved '%s' via blank/signature synonym '%s'", normalized, key)
+                break
     
-    # If we made any replacements, update the paragraph
-    if replacements:
-        _update_paragraph_text(paragraph, working_text, full_text, runs)
-        try:
-            logger.debug("Applied %d replacement(s) in %s", len(replacements), locator)
-        except Exception:
-            pass
+    return normalized, replacement_value
 
 
 def _update_paragraph_text(paragraph, new_text, original_text, runs):
     """
     Update paragraph text while attempting to preserve formatting.
     
-    Strategy: Clear all runs and create a single new run with the first run's formatting.
-    This is a simplified approach - for production, you might want more sophisticated
-    formatting preservation.
+    Strategy: Clear all runs and create a single new run carrying a copy of the
+    first run's properties (<w:rPr>), so every formatting attribute is kept.
     
     Args:
         paragraph: The paragraph to update
@@ -459,41 +653,23 @@ def _update_paragraph_text(paragraph, new_text, original_text, runs):
         original_text: The original text
         runs: The original runs
     """
-    # Store formatting from the first run (if exists)
-    base_format = None
+    # Snapshot the first run's properties (bold, font, colour, highlight, ...)
+    base_rpr = None
     if runs:
-        first_run = runs[0]
-        base_format = {
-            'bold': first_run.bold,
-            'italic': first_run.italic,
-            'underline': first_run.underline,
-            'font_name': first_run.font.name if first_run.font.name else None,
-            'font_size': first_run.font.size,
-        }
-    
-    # Clear all existing runs
-    for run in runs:
-        run.text = ''
+        rpr = runs[0]._r.find(qn('w:rPr'))
+        if rpr is not None:
+            base_rpr = deepcopy(rpr)
     
-    # Remove empty runs
-    for run in paragraph.runs[:]:
-        if run.text == '':
-            run._element.getparent().remove(run._element)
+    # Remove all existing runs (the <w:r> children of <w:p>) directly
+    p_element = paragraph._p
+    for run in runs:
+        p_element.remove(run._r)
     
     # Add new text with preserved formatting
     new_run = paragraph.add_run(new_text)
     
-    if base_format:
-        if base_format['bold'] is not None:
-            new_run.bold = base_format['bold']
-        if base_format['italic'] is not None:
-            new_run.italic = base_format['italic']
-        if base_format['underline'] is not None:
-            new_run.underline = base_format['underline']
-        if base_format['font_name']:
-            new_run.font.name = base_format['font_name']
-        if base_format['font_size']:
-            new_run.font.size = base_format['font_size']
+    if base_rpr is not None:
+        new_run._r.insert(0, base_rpr)
 
 
 def get_normalized_placeholder_name(placeholder_text, pattern_type='auto'):
@@ -515,32 +691,24 @@ def get_normalized_placeholder_name(placeholder_text, pattern_type='auto'):
         cannot determine the exact normalized name without surrounding context.
         It returns a generic placeholder name in those cases.
     """
-    # Strip delimiters
     text = placeholder_text.strip()
     
-    # Remove delimiters based on pattern type (auto-detect)
-    if text.startswith('{{') and text.endswith('}}'):
-        text = text[2:-2].strip()
-        pattern_type = 'double_curly'
-    elif text.startswith('{') and text.endswith('}'):
-        text = text[1:-1].strip()
-        pattern_type = 'single_curly'
-    elif text.startswith('[') and text.endswith(']'):
-        text = text[1:-1].strip()
-        # Check if it's dollar_underscore or just square_bracket
-        if text.startswith('$') or re.match(r'^_{3,}$', text):
-            pattern_type = 'dollar_underscore'
-        else:
-            pattern_type = 'square_bracket'
-    elif text.startswith('$[') and text.endswith(']'):
-        pattern_type = 'dollar_underscore'
-        # Context-dependent, cannot normalize without surrounding text
+    # Context-dependent patterns cannot be normalized without surrounding text
+    if text.startswith('$[') and text.endswith(']'):
         return 'amount_1'  # placeholder default
-    elif re.match(r'^_{3,}$', text):
-        pattern_type = 'underscore'
-        # Context-dependent, cannot normalize without surrounding text
+    if _UNDERSCORE_ONLY_RE.match(text):
         return 'field_1'  # placeholder default
     
+    # Remove delimiters based on pattern type (auto-detect)
+    for prefix, suffix, delimited_type in _DELIMITERS:
+        if text.startswith(prefix) and text.endswith(suffix):
+            text = text[len(prefix):-len(suffix)].strip()
+            pattern_type = delimited_type
+            # Check if it's dollar_underscore or just square_bracket
+            if delimited_type == 'square_bracket' and (text.startswith('$') or _UNDERSCORE_ONLY_RE.match(text)):
+                pattern_type = 'dollar_underscore'
+            break
+    
     # Normalize using shared function for patterns with captured content
     if pattern_type in ['double_curly', 'single_curly', 'square_bracket']:
         return normalize_placeholder_name(text)
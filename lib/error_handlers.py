@@ -3,8 +3,13 @@ Error handling utilities for Legal Document Filler.
 Provides custom error classes and user-friendly error messages.
 """
 
-from flask import jsonify
+from flask import current_app, jsonify
+from functools import lru_cache
+import json
 import logging
+import os
+import re
+import zipfile
 
 
 # Custom exception classes
@@ -78,6 +83,49 @@ ERROR_MESSAGES = {
 }
 
 
+# Used by get_error_response for error types missing from ERROR_MESSAGES
+DEFAULT_ERROR_MESSAGE = {
+    'title': 'Error',
+    'message': 'An unexpected error occurred.',
+    'suggestion': 'Please try again or contact support if the problem persists.'
+}
+
+# Exception-message patterns (case-insensitive) mapped to error responses for
+# handle_docx_error, in priority order: (pattern, error_type, status_code, additional_info)
+DOCX_ERROR_RULES = (
+    (re.compile(r'not a zip file|bad magic number', re.IGNORECASE), 'invalid_docx', 400, None),
+    (re.compile(r'no such file|file not found', re.IGNORECASE), 'file_not_found', 404, None),
+    (re.compile(r'corrupted|damaged', re.IGNORECASE), 'malformed_docx', 400, None),
+    (re.compile(r'empty', re.IGNORECASE), 'empty_document', 400, None),
+    (re.compile(r'permission denied', re.IGNORECASE), 'parsing_failed', 500, {'details': 'File access permission error'}),
+)
+
+
+# Archive entries every .docx package must contain
+REQUIRED_DOCX_ENTRIES = frozenset(('[Content_Types].xml', 'word/document.xml'))
+
+# Leading bytes of a ZIP archive: a local file header, or the end-of-central-directory
+# record of an archive with no entries (reported as malformed, not as a non-ZIP file)
+ZIP_SIGNATURES = frozenset((b'PK\x03\x04', b'PK\x05\x06'))
+
+def _error_payload(error_info):
+    """Build the standard error response body for an ERROR_MESSAGES entry."""
+    return {
+        'success': False,
+        'error': error_info['title'],
+        'message': error_info['message'],
+        'suggestion': error_info['suggestion']
+    }
+
+
+# Static error bodies serialized once, in the form jsonify produces outside debug
+# mode (sorted keys, compact separators, trailing newline)
+_ERROR_BODIES = {
+    error_type: json.dumps(_error_payload(error_info), sort_keys=True, separators=(',', ':')) + '\n'
+    for error_type, error_info in ERROR_MESSAGES.items()
+}
+
+
 def get_error_response(error_type, status_code=400, additional_info=None):
     """
     Generate a standardized error response.
@@ -90,18 +138,15 @@ def get_error_response(error_type, status_code=400, additional_info=None):
     Returns:
         tuple: (JSON response, status code)
     """
-    error_info = ERROR_MESSAGES.get(error_type, {
-        'title': 'Error',
-        'message': 'An unexpected error occurred.',
-        'suggestion': 'Please try again or contact support if the problem persists.'
-    })
+    # Debug mode pretty-prints JSON, so only serve the cached compact bodies outside it
+    if not additional_info and not current_app.debug:
+        body = _ERROR_BODIES.get(error_type)
+        if body is not None:
+            return current_app.response_class(body, mimetype='application/json'), status_code
     
-    response = {
-        'success': False,
-        'error': error_info['title'],
-        'message': error_info['message'],
-        'suggestion': error_info['suggestion']
-    }
+    error_info = ERROR_MESSAGES.get(error_type, DEFAULT_ERROR_MESSAGE)
+    
+    response = _error_payload(error_info)
     
     if additional_info:
         response.update(additional_info)
@@ -123,31 +168,45 @@ def handle_docx_error(error, logger=None):
     if logger:
         logger.error(f"DOCX processing error: {str(error)}", exc_info=True)
     
-    error_str = str(error).lower()
+    error_str = str(error)
     
-    # Determine error type based on exception message
-    if 'not a zip file' in error_str or 'bad magic number' in error_str:
-        return get_error_response('invalid_docx', 400)
+    # Determine error type based on exception message (first matching rule wins)
+    for pattern, error_type, status_code, additional_info in DOCX_ERROR_RULES:
+        if pattern.search(error_str):
+            return get_error_response(error_type, status_code, additional_info)
     
-    elif 'no such file' in error_str or 'file not found' in error_str:
-        return get_error_response('file_not_found', 404)
+    # Generic parsing error
+    return get_error_response('parsing_failed', 400, {
+        'details': 'Document structure could not be parsed'
+    })
+
+
+@lru_cache(maxsize=128)
+def _check_docx_structure(abs_path, mtime_ns, size):
+    """
+    Check the ZIP structure of a non-empty .docx file.
     
-    elif 'corrupted' in error_str or 'damaged' in error_str:
-        return get_error_response('malformed_docx', 400)
+    Cached by (path, mtime, size) so repeat validations of an unchanged upload
+    skip the archive parse. Unexpected errors propagate and are not cached.
     
-    elif 'empty' in error_str:
-        return get_error_response('empty_document', 400)
+    Returns:
+        str: Error type from ERROR_MESSAGES, or None if the file is valid
+    """
+    # Reject non-ZIP uploads (e.g. renamed .doc files) from the 4-byte signature,
+    # before parsing the archive's central directory
+    with open(abs_path, 'rb') as f:
+        if f.read(4) not in ZIP_SIGNATURES:
+            return 'invalid_docx'
     
-    elif 'permission denied' in error_str:
-        return get_error_response('parsing_failed', 500, {
-            'details': 'File access permission error'
-        })
+    try:
+        with zipfile.ZipFile(abs_path, 'r') as zip_file:
+            # Check for required docx structure
+            if not REQUIRED_DOCX_ENTRIES.issubset(zip_file.namelist()):
+                return 'malformed_docx'
+    except zipfile.BadZipFile:
+        return 'invalid_docx'
     
-    else:
-        # Generic parsing error
-        return get_error_response('parsing_failed', 400, {
-            'details': 'Document structure could not be parsed'
-        })
+    return None
 
 
 def validate_docx_file(file_path):
@@ -160,37 +219,28 @@ def validate_docx_file(file_path):
     Returns:
         tuple: (is_valid, error_response or None)
     """
-    import os
-    import zipfile
-    
     # Check file exists
-    if not os.path.exists(file_path):
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
         return False, get_error_response('file_not_found', 404)
     
     # Check file is not empty
-    if os.path.getsize(file_path) == 0:
+    if st.st_size == 0:
         return False, get_error_response('empty_document', 400)
     
     # Check if it's a valid ZIP file (docx is ZIP-based)
     try:
-        with zipfile.ZipFile(file_path, 'r') as zip_file:
-            # Check for required docx structure
-            required_files = ['[Content_Types].xml', 'word/document.xml']
-            file_list = zip_file.namelist()
-            
-            for required in required_files:
-                if required not in file_list:
-                    return False, get_error_response('malformed_docx', 400)
-        
-        return True, None
-    
-    except zipfile.BadZipFile:
-        return False, get_error_response('invalid_docx', 400)
-    
+        error_type = _check_docx_structure(os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
     except Exception as e:
         return False, get_error_response('parsing_failed', 400, {
             'details': 'Could not validate document structure'
         })
+    
+    if error_type:
+        return False, get_error_response(error_type, 400)
+    
+    return True, None
 
 
 # Flask error handler registration functions
@@ -242,6 +292,47 @@ def handle_api_error(error, default_message='An error occurred'):
         }), 500
 
 
+# Fixed parts of the compact file validation error body; only the message is
+# serialized per error (keys in jsonify's sorted order)
+_FILE_VALIDATION_PREFIX = '{"error":"File Validation Error","message":'
+_FILE_VALIDATION_SUFFIX = ',"success":false}\n'
+
+
+def _handle_file_validation_error(error):
+    """Handle file validation errors."""
+    if not current_app.debug:
+        body = _FILE_VALIDATION_PREFIX + json.dumps(str(error)) + _FILE_VALIDATION_SUFFIX
+        return current_app.response_class(body, mimetype='application/json'), 400
+    return jsonify({
+        'success': False,
+        'error': 'File Validation Error',
+        'message': str(error)
+    }), 400
+
+
+def _handle_parsing_error(error):
+    """Handle document parsing errors."""
+    return handle_docx_error(error, current_app.logger)
+
+
+def _handle_llm_error(error):
+    """Handle LLM-related errors."""
+    logger = current_app.logger
+    # Tracebacks are only useful when debugging; skip extracting them during an LLM outage
+    logger.error("LLM error: %s", error, exc_info=logger.isEnabledFor(logging.DEBUG))
+    return jsonify({
+        'success': False,
+        'error': 'AI Service Error',
+        'message': 'The AI service encountered an error. Using fallback mode.',
+        'details': str(error)
+    }), 500
+
+
+def _handle_session_expired(error):
+    """Handle session expiration."""
+    return get_error_response('session_expired', 401)
+
+
 def register_error_handlers(app):
     """
     Register custom error handlers with Flask app.
@@ -249,34 +340,7 @@ def register_error_handlers(app):
     Args:
         app: Flask application instance
     """
-    
-    @app.errorhandler(FileValidationError)
-    def handle_file_validation_error(error):
-        """Handle file validation errors."""
-        return jsonify({
-            'success': False,
-            'error': 'File Validation Error',
-            'message': str(error)
-        }), 400
-    
-    @app.errorhandler(ParsingError)
-    def handle_parsing_error(error):
-        """Handle document parsing errors."""
-        return handle_docx_error(error, app.logger)
-    
-    @app.errorhandler(LLMError)
-    def handle_llm_error(error):
-        """Handle LLM-related errors."""
-        app.logger.error(f"LLM error: {str(error)}", exc_info=True)
-        return jsonify({
-            'success': False,
-            'error': 'AI Service Error',
-            'message': 'The AI service encountered an error. Using fallback mode.',
-            'details': str(error)
-        }), 500
-    
-    @app.errorhandler(SessionExpiredError)
-    def handle_session_expired(error):
-        """Handle session expiration."""
-        return get_error_response('session_expired', 401)
-
+    app.register_error_handler(FileValidationError, _handle_file_validation_error)
+    app.register_error_handler(ParsingError, _handle_parsing_error)
+    app.register_error_handler(LLMError, _handle_llm_error)
+    app.register_error_handler(SessionExpiredError, _handle_session_expired)
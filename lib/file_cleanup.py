@@ -6,11 +6,15 @@ Handles cleanup of temporary files, uploaded documents, and orphaned files
 import os
 import time
 import logging
+import threading
 from datetime import datetime, timedelta
 from config import Config
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of failure messages returned in a cleanup summary
+MAX_CLEANUP_ERRORS = 64
+
 
 class FileCleanup:
     """
@@ -25,6 +29,8 @@ class FileCleanup:
             upload_folder (str): Path to the upload folder (default: from Config)
         """
         self.upload_folder = upload_folder or Config.UPLOAD_FOLDER
+        # Joined with bare filenames in place of os.path.join; scandir loops use entry.path
+        self._upload_prefix = self.upload_folder.rstrip(os.sep) + os.sep
     
     def cleanup_expired_files(self, max_age_hours=24):
         """
@@ -34,7 +40,8 @@ class FileCleanup:
             max_age_hours (int): Maximum file age in hours before cleanup
         
         Returns:
-            dict: Summary of cleanup operation
+            dict: Summary of cleanup operation; at most MAX_CLEANUP_ERRORS error
+                  messages are included, with the rest counted in errors_truncated
         """
         try:
             if not os.path.exists(self.upload_folder):
@@ -45,40 +52,62 @@ class FileCleanup:
                     'error': 'Upload folder not found'
                 }
             
-            now = time.time()
-            max_age_seconds = max_age_hours * 3600
+            # Files last modified before this instant are expired; comparing integer
+            # nanosecond mtimes avoids a float subtraction per file
+            now_ns = time.time_ns()
+            threshold_ns = now_ns - int(max_age_hours * 3600 * 1_000_000_000)
             
             files_cleaned = 0
             errors = []
+            errors_truncated = 0
             
-            for filename in os.listdir(self.upload_folder):
-                file_path = os.path.join(self.upload_folder, filename)
-                
-                # Skip directories
-                if not os.path.isfile(file_path):
-                    continue
-                
-                try:
-                    # Get file modification time
-                    file_age = now - os.path.getmtime(file_path)
+            def record_error(filename, error):
+                """Log a failure; keep at most MAX_CLEANUP_ERRORS messages for the summary."""
+                nonlocal errors_truncated
+                error_msg = f"Failed to clean up {filename}: {str(error)}"
+                logger.error(error_msg)
+                if len(errors) < MAX_CLEANUP_ERRORS:
+                    errors.append(error_msg)
+                else:
+                    errors_truncated += 1
+            
+            # Phase 1: collect expired files. scandir yields type and stat data with
+            # each entry, avoiding a separate stat() call per file for isfile/getmtime
+            expired = []
+            with os.scandir(self.upload_folder) as entries:
+                for entry in entries:
+                    # Skip directories
+                    if not entry.is_file():
+                        continue
+                    
+                    try:
+                        # Get file modification time
+                        mtime_ns = entry.stat().st_mtime_ns
+                    except Exception as e:
+                        record_error(entry.name, e)
+                        continue
                     
                     # Check if file is expired
-                    if file_age > max_age_seconds:
-                        os.remove(file_path)
-                        files_cleaned += 1
-                        logger.info(f"Cleaned up expired file: {filename} (age: {file_age/3600:.1f} hours)")
+                    if mtime_ns < threshold_ns:
+                        expired.append((entry.path, entry.name, mtime_ns))
+            
+            # Phase 2: delete them once the directory handle is closed
+            for file_path, filename, mtime_ns in expired:
+                try:
+                    os.unlink(file_path)
+                    files_cleaned += 1
+                    logger.info(f"Cleaned up expired file: {filename} (age: {(now_ns - mtime_ns) / 3.6e12:.1f} hours)")
                 
                 except Exception as e:
-                    error_msg = f"Failed to clean up {filename}: {str(e)}"
-                    logger.error(error_msg)
-                    errors.append(error_msg)
+                    record_error(filename, e)
             
             logger.info(f"File cleanup complete: {files_cleaned} files removed")
             
             return {
                 'success': True,
                 'files_cleaned': files_cleaned,
-                'errors': errors if errors else None
+                'errors': errors if errors else None,
+                'errors_truncated': errors_truncated
             }
         
         except Exception as e:
@@ -100,15 +129,13 @@ class FileCleanup:
             bool: True if successful, False otherwise
         """
         try:
-            file_path = os.path.join(self.upload_folder, filename)
-            
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                logger.info(f"Cleaned up specific file: {filename}")
-                return True
-            else:
-                logger.warning(f"File not found for cleanup: {filename}")
-                return False
+            os.remove(self._upload_prefix + filename)
+            logger.info(f"Cleaned up specific file: {filename}")
+            return True
+        
+        except FileNotFoundError:
+            logger.warning(f"File not found for cleanup: {filename}")
+            return False
         
         except Exception as e:
             logger.error(f"Error cleaning up {filename}: {e}")
@@ -124,14 +151,18 @@ class FileCleanup:
         Returns:
             bool: True if successful, False otherwise
         """
+        if not file_path:
+            logger.warning(f"File not found for cleanup: {file_path}")
+            return False
+        
         try:
-            if file_path and os.path.exists(file_path):
-                os.remove(file_path)
-                logger.info(f"Cleaned up file: {file_path}")
-                return True
-            else:
-                logger.warning(f"File not found for cleanup: {file_path}")
-                return False
+            os.remove(file_path)
+            logger.info(f"Cleaned up file: {file_path}")
+            return True
+        
+        except FileNotFoundError:
+            logger.warning(f"File not found for cleanup: {file_path}")
+            return False
         
         except Exception as e:
             logger.error(f"Error cleaning up {file_path}: {e}")
@@ -203,17 +234,18 @@ class FileCleanup:
             
             now = time.time()
             
-            for filename in os.listdir(self.upload_folder):
-                file_path = os.path.join(self.upload_folder, filename)
-                
-                if os.path.isfile(file_path):
-                    total_files += 1
-                    total_size += os.path.getsize(file_path)
-                    
-                    file_age = now - os.path.getmtime(file_path)
-                    if file_age > oldest_age:
-                        oldest_age = file_age
-                        oldest_file = filename
+            with os.scandir(self.upload_folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        # One stat() serves both size and age
+                        stat = entry.stat()
+                        total_files += 1
+                        total_size += stat.st_size
+                        
+                        file_age = now - stat.st_mtime
+                        if file_age > oldest_age:
+                            oldest_age = file_age
+                            oldest_file = entry.name
             
             return {
                 'exists': True,
@@ -253,12 +285,29 @@ class FileCleanup:
             logger.error(f"Error cleaning up after download: {e}")
             return False
 
+    
+    def register_cleanup_on_response(self, response, file_path):
+        """
+        Remove a file once a response has been sent.
+        The file is cleaned up when the WSGI server closes the response, after the
+        body (e.g. from send_file) has been streamed, even if the client disconnects.
+        
+        Args:
+            response: Flask/Werkzeug response object
+            file_path (str): Full path to the file to remove
+        
+        Returns:
+            The same response, for chaining in a view's return statement
+        """
+        response.call_on_close(lambda: self.cleanup_file_by_path(file_path))
+        return response
+
 
 # Global file cleanup instance
 file_cleanup = FileCleanup()
 
 
-def schedule_periodic_cleanup(app, interval_hours=24, max_age_hours=24):
+def schedule_periodic_cleanup(app, interval_hours=24, max_age_hours=24, stop_event=None):
     """
     Schedule periodic file cleanup (for production use with task scheduler).
     
@@ -271,9 +320,12 @@ def schedule_periodic_cleanup(app, interval_hours=24, max_age_hours=24):
         app: Flask application instance
         interval_hours (int): How often to run cleanup (hours)
         max_age_hours (int): Maximum file age before cleanup (hours)
+        stop_event (threading.Event): Event that stops the task when set (default: new event)
+    
+    Returns:
+        threading.Event: The stop event, also stored as app.extensions['file_cleanup_stop']
     """
-    import threading
-    import time as time_module
+    stop_event = stop_event or threading.Event()
     
     def cleanup_task():
         """Background cleanup task."""
@@ -286,11 +338,14 @@ def schedule_periodic_cleanup(app, interval_hours=24, max_age_hours=24):
             except Exception as e:
                 logger.error(f"Error in scheduled cleanup: {e}")
             
-            # Sleep until next interval
-            time_module.sleep(interval_hours * 3600)
+            # Wait until next interval; returns early (True) once stop is requested
+            if stop_event.wait(interval_hours * 3600):
+                logger.info("Scheduled file cleanup stopped")
+                break
     
     # Start cleanup thread
-    cleanup_thread = threading.Thread(target=cleanup_task, daemon=True)
+    cleanup_thread = threading.Thread(target=cleanup_task, name='file-cleanup', daemon=True)
     cleanup_thread.start()
+    app.extensions['file_cleanup_stop'] = stop_event
     logger.info(f"Scheduled periodic cleanup: every {interval_hours} hours, max age {max_age_hours} hours")
-
+    return stop_event
@@ -3,11 +3,14 @@ LLM service for Legal Document Filler using Google Gemini 2.5 Pro.
 Generates natural language questions for placeholder fields.
 """
 
-import google.generativeai as genai
 import os
 import json
+import random
+import re
+import threading
+import time
+from collections import deque
 from functools import lru_cache
-from datetime import datetime, timedelta
 import logging
 
 # Configure logging
@@ -16,26 +19,75 @@ logger = logging.getLogger(__name__)
 # Initialize Gemini API
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 ENABLE_LLM = os.getenv('ENABLE_LLM', 'true').lower() == 'true'
+# Always call the LLM, even for names the keyword fallback questions already cover
+FORCE_LLM = os.getenv('FORCE_LLM', 'false').lower() in ('1', 'true')
 
 # Model configuration
 # Model selection with fallback
 # Primary model can be overridden with LLM_MODEL env. Fallback can be set via LLM_MODEL_FALLBACK
 MODEL_NAME = os.getenv('LLM_MODEL', 'gemini-2.5-pro')
 MODEL_FALLBACK = os.getenv('LLM_MODEL_FALLBACK', 'gemini-2.0-flash-exp')
+# Models to try in order; fixed for the life of the process
+_MODEL_SEQUENCE = (MODEL_NAME, MODEL_FALLBACK) if MODEL_FALLBACK and MODEL_FALLBACK != MODEL_NAME else (MODEL_NAME,)
 GENERATION_CONFIG = {
     'temperature': 0.3,  # More consistent, less creative
     'max_output_tokens': 4096,  # Give enough room to avoid early truncation
     'top_p': 0.8,
 }
 
-# Rate limiting tracking
+# Attempts per model for transient upstream errors (timeouts, service unavailable)
+MAX_GENERATION_ATTEMPTS = 3
+
+# Rate limiting tracking: monotonic timestamps of requests in the last minute, oldest first
 _rate_limit_tracker = {
-    'requests': [],
+    'requests': deque(),
     'max_per_minute': 15  # Gemini free tier: 15 RPM
 }
+_rate_limit_lock = threading.Lock()
+
+# Numbered lines in batch responses: "1. question", "1) ...", "1: ...", "1 - ..."
+_NUMBERED_LINE_RE = re.compile(r'^\s*(\d+)\s*[.):-]\s*(.+?)\s*$')
+
+# Prompt for a single placeholder question (generate_question)
+_QUESTION_PROMPT = """Convert this placeholder name into a clear, professional question for a legal document.
+
+The question should:
+- Be concise (one sentence)
+- Be professional and formal in tone
+- Clearly indicate what information is needed
+- Be suitable for a legal document context
+
+Placeholder name: {placeholder_name}
+
+Generate only the question, nothing else:"""
+
+# Prompt for numbered batch questions (generate_questions_batch)
+_BATCH_PROMPT = """Convert these placeholder names into clear, professional questions for a legal document.
+
+Instructions:
+- Generate one question per placeholder
+- Keep questions concise (one sentence each)
+- Use professional and formal tone
+- Clearly indicate what information is needed
+- Number each question to match the placeholder number
+- Format: "1. [question]" for each line
+
+Placeholders:
+{placeholders_list}
+
+Generate the questions (numbered 1-{count}):"""
 
 # Cached model instances per model name
 _model_instances = {}
+_model_lock = threading.Lock()
+
+# google.generativeai is slow to import; it is loaded by initialize_gemini()
+# only once the LLM is actually enabled and configured.
+genai = None
+
+# Upstream errors worth retrying on the same model; resolved by initialize_gemini()
+# alongside genai (an empty tuple matches nothing)
+_TRANSIENT_ERRORS = ()
 
 
 def initialize_gemini():
@@ -45,7 +97,7 @@ def initialize_gemini():
     Returns:
         bool: True if initialization successful, False otherwise
     """
-    global GOOGLE_API_KEY, ENABLE_LLM
+    global GOOGLE_API_KEY, ENABLE_LLM, genai, _TRANSIENT_ERRORS
     
     if not ENABLE_LLM:
         logger.info("LLM is disabled via ENABLE_LLM environment variable")
@@ -56,6 +108,10 @@ def initialize_gemini():
         return False
     
     try:
+        if genai is None:
+            import google.generativeai as genai
+            from google.api_core import exceptions as google_exceptions
+            _TRANSIENT_ERRORS = (google_exceptions.DeadlineExceeded, google_exceptions.ServiceUnavailable)
         genai.configure(api_key=GOOGLE_API_KEY)
         logger.info(f"Gemini API initialized successfully. Primary model: {MODEL_NAME}; Fallback: {MODEL_FALLBACK}")
         return True
@@ -68,55 +124,86 @@ def get_model(model_name: str = None):
     """
     Get the configured Gemini model instance.
     
+    The API is configured once at import (see _gemini_initialized) and each model
+    is constructed on first use, so repeat calls are a dict lookup.
+    
     Returns:
         GenerativeModel: Configured model instance or None if not available
     """
-    if not initialize_gemini():
+    name = model_name or MODEL_NAME
+    model = _model_instances.get(name)
+    if model is not None:
+        return model
+    
+    if not _gemini_initialized:
         return None
     
     try:
-        name = model_name or MODEL_NAME
-        if name not in _model_instances:
-            _model_instances[name] = genai.GenerativeModel(name)
-        return _model_instances[name]
+        with _model_lock:
+            # Another thread may have built it while we waited for the lock
+            model = _model_instances.get(name)
+            if model is None:
+                model = _model_instances[name] = genai.GenerativeModel(name)
+        return model
     except Exception as e:
         logger.error(f"Failed to create model instance '{model_name or MODEL_NAME}': {str(e)}")
         return None
 
 
-def check_rate_limit():
+def _check_rate_window(now):
     """
-    Check if we're within rate limits.
+    Drop expired entries from the rate-limit window and check it against the limit.
+    Must be called with _rate_limit_lock held.
     
     Returns:
         tuple: (allowed: bool, wait_seconds: int)
     """
-    global _rate_limit_tracker
-    
-    now = datetime.now()
-    one_minute_ago = now - timedelta(minutes=1)
+    requests = _rate_limit_tracker['requests']
+    one_minute_ago = now - 60.0
     
-    # Remove requests older than 1 minute
-    _rate_limit_tracker['requests'] = [
-        req_time for req_time in _rate_limit_tracker['requests']
-        if req_time > one_minute_ago
-    ]
+    # Remove requests older than 1 minute (timestamps are in order, so pop from the left)
+    while requests and requests[0] <= one_minute_ago:
+        requests.popleft()
     
-    current_count = len(_rate_limit_tracker['requests'])
-    max_requests = _rate_limit_tracker['max_per_minute']
-    
-    if current_count >= max_requests:
-        # Calculate wait time
-        oldest_request = min(_rate_limit_tracker['requests'])
-        wait_seconds = int((oldest_request + timedelta(minutes=1) - now).total_seconds()) + 1
+    if len(requests) >= _rate_limit_tracker['max_per_minute']:
+        # Calculate wait time until the oldest request leaves the window
+        wait_seconds = int(requests[0] + 60.0 - now) + 1
         return False, wait_seconds
     
     return True, 0
 
 
+def check_rate_limit():
+    """
+    Check if we're within rate limits.
+    
+    Returns:
+        tuple: (allowed: bool, wait_seconds: int)
+    """
+    with _rate_limit_lock:
+        return _check_rate_window(time.monotonic())
+
+
 def record_request():
     """Record a new API request for rate limiting."""
-    _rate_limit_tracker['requests'].append(datetime.now())
+    with _rate_limit_lock:
+        _rate_limit_tracker['requests'].append(time.monotonic())
+
+
+def acquire_request_slot():
+    """
+    Check the rate limit and record a request in one step, so concurrent
+    callers cannot all pass the check before any of them is recorded.
+    
+    Returns:
+        tuple: (allowed: bool, wait_seconds: int); the request is recorded only if allowed
+    """
+    with _rate_limit_lock:
+        now = time.monotonic()
+        allowed, wait_seconds = _check_rate_window(now)
+        if allowed:
+            _rate_limit_tracker['requests'].append(now)
+    return allowed, wait_seconds
 
 
 def is_llm_enabled():
@@ -162,6 +249,11 @@ def generate_question(placeholder_name: str, use_llm: bool = True) -> str:
         logger.debug(f"LLM disabled, using fallback for: {placeholder_name}")
         return fallback
     
+    # Names matching a keyword question are answered well enough without a round trip
+    if _has_keyword_fallback(placeholder_name):
+        logger.debug(f"Keyword fallback covers: {placeholder_name}")
+        return fallback
+    
     # Check rate limits
     allowed, wait_seconds = check_rate_limit()
     if not allowed:
@@ -170,17 +262,7 @@ def generate_question(placeholder_name: str, use_llm: bool = True) -> str:
     
     try:
         # Create prompt
-        prompt = f"""Convert this placeholder name into a clear, professional question for a legal document.
-
-The question should:
-- Be concise (one sentence)
-- Be professional and formal in tone
-- Clearly indicate what information is needed
-- Be suitable for a legal document context
-
-Placeholder name: {placeholder_name}
-
-Generate only the question, nothing else:"""
+        prompt = _QUESTION_PROMPT.format(placeholder_name=placeholder_name)
         
         # Generate content with timeout (with model fallback)
         try:
@@ -210,9 +292,6 @@ Generate only the question, nothing else:"""
                 logger.warning("No text in response, using fallback")
                 return fallback
                 
-        except TimeoutError:
-            logger.warning(f"Timeout generating question for '{placeholder_name}'")
-            return fallback
         except Exception as e:
             logger.error(f"Error calling Gemini API: {str(e)}")
             return fallback
@@ -222,6 +301,17 @@ Generate only the question, nothing else:"""
         return fallback
 
 
+@lru_cache(maxsize=2048)
+def _batch_fallback_question(placeholder_name: str) -> str:
+    """Fallback question for one placeholder in a batch."""
+    return f"Please provide: {placeholder_name.replace('_', ' ').title()}"
+
+
+def _fallback_map(placeholder_names) -> dict:
+    """Build the fallback {placeholder_name: question} dict for a batch."""
+    return {name: _batch_fallback_question(name) for name in placeholder_names}
+
+
 def generate_questions_batch(placeholder_names: list) -> dict:
     """
     Generate questions for multiple placeholders in a single API call.
@@ -244,38 +334,26 @@ def generate_questions_batch(placeholder_names: list) -> dict:
     if not placeholder_names:
         return {}
     
+    # Ask about each name once; the result is keyed by name, so duplicates add nothing
+    placeholder_names = list(dict.fromkeys(placeholder_names))
+    
     # Check if LLM is enabled
     if not is_llm_enabled():
         logger.debug("LLM disabled, using fallback for batch")
-        return {name: f"Please provide: {name.replace('_', ' ').title()}" 
-                for name in placeholder_names}
+        return _fallback_map(placeholder_names)
     
     # Check rate limits
     allowed, wait_seconds = check_rate_limit()
     if not allowed:
         logger.warning(f"Rate limit exceeded. Using fallback for batch.")
-        return {name: f"Please provide: {name.replace('_', ' ').title()}" 
-                for name in placeholder_names}
+        return _fallback_map(placeholder_names)
     
     try:
         # Create numbered list of placeholders
-        placeholders_list = "\n".join([f"{i+1}. {name}" for i, name in enumerate(placeholder_names)])
+        placeholders_list = "\n".join(f"{i}. {name}" for i, name in enumerate(placeholder_names, 1))
         
         # Create batch prompt
-        prompt = f"""Convert these placeholder names into clear, professional questions for a legal document.
-
-Instructions:
-- Generate one question per placeholder
-- Keep questions concise (one sentence each)
-- Use professional and formal tone
-- Clearly indicate what information is needed
-- Number each question to match the placeholder number
-- Format: "1. [question]" for each line
-
-Placeholders:
-{placeholders_list}
-
-Generate the questions (numbered 1-{len(placeholder_names)}):"""
+        prompt = _BATCH_PROMPT.format(placeholders_list=placeholders_list, count=len(placeholder_names))
         
         # Generate content with timeout (with model fallback)
         try:
@@ -285,62 +363,46 @@ Generate the questions (numbered 1-{len(placeholder_names)}):"""
             response_text = _extract_response_text(response)
             if response_text:
                 response_text = response_text.strip()
-                lines = response_text.split('\n')
-                
-                questions = {}
                 
-                # Parse each line
-                for i, name in enumerate(placeholder_names):
-                    question_number = i + 1
-                    found = False
+                # Collect the first valid question for each number in one pass
+                numbered = {}
+                for line in response_text.splitlines():
+                    match = _NUMBERED_LINE_RE.match(line)
+                    if not match:
+                        continue
+                    question_number = int(match.group(1))
+                    if question_number in numbered:
+                        continue
                     
-                    # Look for the numbered question
-                    for line in lines:
-                        line = line.strip()
-                        # Match patterns like "1.", "1)", "1:", "1 -", etc.
-                        if line.startswith(f"{question_number}.") or \
-                           line.startswith(f"{question_number})") or \
-                           line.startswith(f"{question_number}:") or \
-                           line.startswith(f"{question_number} -"):
-                            # Extract question text
-                            question = line.split(maxsplit=1)
-                            if len(question) > 1:
-                                question_text = question[1].strip()
-                                # Clean up
-                                question_text = question_text.strip('"\'')
-                                if question_text and not question_text.endswith(('?', '.', '!')):
-                                    question_text += '?'
-                                
-                                if len(question_text) > 0 and len(question_text) <= 500:
-                                    questions[name] = question_text
-                                    found = True
-                                    break
+                    # Clean up
+                    question_text = match.group(2).strip('"\'')
+                    if question_text and not question_text.endswith(('?', '.', '!')):
+                        question_text += '?'
                     
-                    # Fallback for this placeholder if not found or invalid
-                    if not found:
-                        questions[name] = f"Please provide: {name.replace('_', ' ').title()}"
+                    if len(question_text) > 0 and len(question_text) <= 500:
+                        numbered[question_number] = question_text
+                
+                # Fallback for each placeholder not found or invalid
+                questions = _fallback_map(placeholder_names)
+                for question_number, name in enumerate(placeholder_names, 1):
+                    question_text = numbered.get(question_number)
+                    if question_text:
+                        questions[name] = question_text
                 
                 logger.info(f"Generated {len(questions)} questions in batch (success: {sum(1 for q in questions.values() if 'Please provide' not in q)})")
                 return questions
             
             else:
                 logger.warning("No text in batch response, using fallback")
-                return {name: f"Please provide: {name.replace('_', ' ').title()}" 
-                        for name in placeholder_names}
+                return _fallback_map(placeholder_names)
         
-        except TimeoutError:
-            logger.warning("Timeout in batch generation, using fallback")
-            return {name: f"Please provide: {name.replace('_', ' ').title()}" 
-                    for name in placeholder_names}
         except Exception as e:
             logger.error(f"Error in batch API call: {str(e)}")
-            return {name: f"Please provide: {name.replace('_', ' ').title()}" 
-                    for name in placeholder_names}
+            return _fallback_map(placeholder_names)
     
     except Exception as e:
         logger.error(f"Unexpected error in batch generation: {str(e)}")
-        return {name: f"Please provide: {name.replace('_', ' ').title()}" 
-                for name in placeholder_names}
+        return _fallback_map(placeholder_names)
 
 
 def clear_question_cache():
@@ -408,38 +470,52 @@ def _extract_response_text(resp) -> str:
     return ''
 
 
-def _model_sequence() -> list:
-    """Return the list of models to try in order."""
-    seq = [MODEL_NAME]
-    if MODEL_FALLBACK and MODEL_FALLBACK not in seq:
-        seq.append(MODEL_FALLBACK)
-    return seq
-
-
 def _generate_with_fallback(prompt: str, gen_config: dict, timeout_seconds: int) -> tuple:
     """
     Try generating content using primary model, then fallback models on error/timeout.
+    Transient upstream errors (deadline exceeded, service unavailable) are retried on the
+    same model with jittered exponential backoff. timeout_seconds bounds the whole call:
+    each attempt gets only the time remaining, and no retry or fallback model is tried
+    once it has passed. Every attempt takes a rate-limit slot; generation stops once the
+    limit is reached.
     Returns (response, model_name) or (None, None) if all failed.
     """
-    models = _model_sequence()
-    logger.info("Attempting generation with model sequence: %s (timeout: %ds)", models, timeout_seconds)
-    for name in models:
+    deadline = time.monotonic() + timeout_seconds
+    
+    logger.info("Attempting generation with model sequence: %s (timeout: %ds)", list(_MODEL_SEQUENCE), timeout_seconds)
+    for name in _MODEL_SEQUENCE:
         try:
             logger.info("Trying model: %s", name)
             model = get_model(name)
             if not model:
                 logger.warning(f"Model '{name}' not available; trying next")
                 continue
-            record_request()
-            logger.info("Sending request to model '%s'...", name)
-            resp = model.generate_content(
-                prompt,
-                generation_config=gen_config,
-                request_options={'timeout': timeout_seconds}
-            )
-            logger.info("Model '%s' responded successfully", name)
-            logger.info("Raw response from API: %s", resp)
-            return resp, name
+            for attempt in range(1, MAX_GENERATION_ATTEMPTS + 1):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("Generation timed out after %ds; not trying model '%s'", timeout_seconds, name)
+                    return None, None
+                try:
+                    allowed, wait_seconds = acquire_request_slot()
+                    if not allowed:
+                        logger.warning("Rate limit reached before calling model '%s'. Wait %ds.", name, wait_seconds)
+                        return None, None
+                    logger.info("Sending request to model '%s'...", name)
+                    resp = model.generate_content(
+                        prompt,
+                        generation_config=gen_config,
+                        request_options={'timeout': remaining}
+                    )
+                    logger.info("Model '%s' responded successfully", name)
+                    logger.info("Raw response from API: %s", resp)
+                    return resp, name
+                except _TRANSIENT_ERRORS as e:
+                    delay = min(0.2 * 2 ** (attempt - 1) + random.random() * 0.1, 2.0)
+                    # Give up on this model if the backoff would use up the remaining time
+                    if attempt == MAX_GENERATION_ATTEMPTS or time.monotonic() + delay >= deadline:
+                        raise
+                    logger.warning("Transient error on model '%s' (attempt %d): %s; retrying in %.2fs", name, attempt, e, delay)
+                    time.sleep(delay)
         except Exception as e:
             logger.warning(f"Generation failed on model '{name}': {e}", exc_info=True)
             continue
@@ -465,9 +541,8 @@ def _prepare_batch_payload(items: list) -> str:
     Deduplicates sentence context to reduce payload size. Sentences are
     indexed and referenced by ID in the items array.
     """
-    # Group placeholders by their sentence context (using a hash of prev+sentence+next)
-    sentence_map = {}  # hash -> {id, prev, sentence, next}
-    sentence_id_counter = 1
+    # Group placeholders by their sentence context (prev, sentence, next)
+    sentence_map = {}  # context -> {id, prev, sentence, next}; insertion order is ID order
     
     structured_items = []
     for item in items:
@@ -476,31 +551,28 @@ def _prepare_batch_payload(items: list) -> str:
         sentence = _clip_text(context.get('sentence', ''), 320)
         next_ = _clip_text(context.get('next', ''), 220)
         
-        # Create a stable hash of the context
-        context_hash = hash((prev, sentence, next_))
-        
         # Register sentence if not seen before
-        if context_hash not in sentence_map:
-            sentence_map[context_hash] = {
-                "id": sentence_id_counter,
+        context_key = (prev, sentence, next_)
+        entry = sentence_map.get(context_key)
+        if entry is None:
+            entry = sentence_map[context_key] = {
+                "id": len(sentence_map) + 1,
                 "previous": prev,
                 "sentence": sentence,
                 "next": next_
             }
-            sentence_id_counter += 1
         
         # Reference the sentence by ID
         structured_items.append({
             "placeholder": item.get('normalized', ''),
             "pattern": item.get('pattern_type', ''),
             "original": item.get('original', ''),
-            "sentence_id": sentence_map[context_hash]["id"]
+            "sentence_id": entry["id"]
         })
     
     # Build final payload
-    sentences_array = sorted(sentence_map.values(), key=lambda x: x["id"])
     payload = {
-        "sentences": sentences_array,
+        "sentences": list(sentence_map.values()),
         "items": structured_items
     }
     
@@ -636,6 +708,51 @@ def generate_questions_for_candidates(items: list, use_llm: bool = True) -> dict
         return results
 
 
+# Keyword fallback questions, in priority order (the first keyword found in the name wins)
+_FALLBACK_KEYWORD_QUESTIONS = (
+    ('name', "What is the full name?"),
+    ('company', "What is the company name?"),
+    ('date', "What is the relevant date? (e.g., January 1, 2024)"),
+    ('address', "What is the full address?"),
+    ('email', "What is the email address?"),
+    ('phone', "What is the phone number?"),
+    ('amount', "What is the amount? (e.g., $1,000.00)"),
+    ('title', "What is the title or position?"),
+    ('signature', "Who should sign here?"),
+    ('party', "What is the party's name?"),
+    ('effective', "What is the effective date?"),
+    ('term', "What is the term or duration?"),
+)
+_FALLBACK_KEYWORDS = frozenset(key for key, _ in _FALLBACK_KEYWORD_QUESTIONS)
+
+# Qualifiers that leave a keyword's fallback question accurate; none of them contains
+# a keyword, so _contextual_fallback_question still picks the name's own keyword
+_KEYWORD_SHORTCUT_QUALIFIERS = frozenset((
+    'client', 'customer', 'contact', 'primary', 'business', 'home', 'work',
+    'mailing', 'billing', 'signing', 'start', 'end', 'birth', 'due',
+))
+
+
+def _has_keyword_fallback(normalized: str) -> bool:
+    """
+    Whether the keyword fallback question is a reliable answer for a placeholder name
+    (disabled by FORCE_LLM).
+    
+    Only names made of exactly one keyword token, optionally with one generic
+    qualifier token (e.g. 'email', 'client_email', 'signing_date'), qualify. Names
+    with several keywords ('company_name', 'effective_date') or other words
+    ('termination_fee', 'amount_1') go to the LLM.
+    """
+    if FORCE_LLM:
+        return False
+    tokens = (normalized or '').replace('-', '_').lower().split('_')
+    keywords = [token for token in tokens if token in _FALLBACK_KEYWORDS]
+    if len(keywords) != 1:
+        return False
+    qualifiers = [token for token in tokens if token not in _FALLBACK_KEYWORDS]
+    return len(qualifiers) <= 1 and all(token in _KEYWORD_SHORTCUT_QUALIFIERS for token in qualifiers)
+
+
 def _contextual_fallback_question(normalized: str, sentence: str = '') -> str:
     """Generate a conversational fallback question using placeholder name + context."""
     normalized = normalized or ''
@@ -655,25 +772,9 @@ def _contextual_fallback_question(normalized: str, sentence: str = '') -> str:
             return f"What information should fill this blank? Context: \"{snippet}\""
         return "What information should fill this blank?"
 
-    keywords = {
-        'name': "What is the full name?",
-        'company': "What is the company name?",
-        'date': "What is the relevant date? (e.g., January 1, 2024)",
-        'address': "What is the complete address?",
-        'email': "What is the email address?",
-        'phone': "What is the phone number?",
-        'amount': "What is the amount? (e.g., $1,000.00)",
-        'title': "What is the title or position?",
-        'signature': "Who should sign here?",
-        'party': "What is the party's name?",
-        'effective': "What is the effective date?",
-        'term': "What is the term or duration?",
-        'address': "What is the full address?"
-    }
-
     lowered = clean_name.lower()
-    for key, question in keywords.items():
-        if key in lowered and key != 'blank':
+    for key, question in _FALLBACK_KEYWORD_QUESTIONS:
+        if key in lowered:
             if snippet:
                 return f"{question} Context: \"{snippet}\""
             return question
@@ -711,6 +812,10 @@ def generate_question_from_context(normalized: str, sentence: str, prev: str = '
     if not use_llm or not is_llm_enabled():
         return {'question': fallback_q, 'options': list(options) if options else None}
 
+    # Without context or options the LLM has nothing beyond the name to go on
+    if not (options or prev or sentence or next_) and _has_keyword_fallback(normalized):
+        return {'question': fallback_q, 'options': None}
+
     allowed, wait_seconds = check_rate_limit()
     if not allowed:
         return {'question': fallback_q, 'options': list(options) if options else None}
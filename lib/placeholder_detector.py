@@ -5,12 +5,35 @@ Detects multiple placeholder patterns in .docx files.
 
 import logging
 import re
+from functools import lru_cache
 from docx import Document
 from typing import Dict, List, Set
 
 
 logger = logging.getLogger(__name__)
 
+# Patterns used by detect_placeholders_with_context, compiled once at import
+_CONTEXT_PATTERNS = [
+    (re.compile(r'\$\s*\[\s*_{3,}\s*\]'), 'dollar_underscore'),
+    (re.compile(r'\[\s*([A-Za-z][A-Za-z0-9_\s-]+?)\s*\]'), 'square_bracket'),
+    (re.compile(r'\{\{\s*([A-Za-z0-9_\s-]+?)\s*\}\}'), 'double_curly'),
+    (re.compile(r'\{\s*([A-Za-z0-9_\s-]+?)\s*\}'), 'single_curly'),
+    (re.compile(r'_{3,}'), 'underscore'),
+]
+
+# Arbitration priorities for overlapping candidates (higher wins)
+_PRIORITY_MAP = {
+    'signature_label': 6,
+    'dollar_underscore': 5,
+    'square_bracket': 4,
+    'double_curly': 3,
+    'single_curly': 2,
+    'underscore': 1,
+}
+
+# Bare signature line such as "Address:" or "Email: ______"
+_SIGNATURE_LINE_RE = re.compile(r'^\s*(Address|Email|E-mail|Phone|Name|Title)\s*:?\s*([ \t\._\-—]*)$', re.IGNORECASE)
+
 
 class PlaceholderDetectionError(Exception):
     """Custom exception for placeholder detection errors."""
@@ -289,9 +312,11 @@ def get_total_occurrences(placeholders: Dict[str, List[str]]) -> int:
     return sum(len(originals) for originals in placeholders.values())
 
 
+@lru_cache(maxsize=1024)
 def normalize_placeholder_name(name: str) -> str:
     """
     Normalize a placeholder name to a consistent format.
+    Results are memoized: templates repeat the same few names many times.
     
     Rules:
     - Convert to lowercase
@@ -461,23 +486,6 @@ def detect_placeholders_with_context(docx_path: str) -> Dict[str, any]:
     placeholders: Dict[str, List[str]] = {}
     candidates: List[Dict[str, any]] = []
 
-    # Patterns and priorities
-    patterns = [
-        (r'\$\s*\[\s*_{3,}\s*\]', 'dollar_underscore'),
-        (r'\[\s*([A-Za-z][A-Za-z0-9_\s-]+?)\s*\]', 'square_bracket'),
-        (r'\{\{\s*([A-Za-z0-9_\s-]+?)\s*\}\}', 'double_curly'),
-        (r'\{\s*([A-Za-z0-9_\s-]+?)\s*\}', 'single_curly'),
-        (r'_{3,}', 'underscore'),
-    ]
-    priority_map = {
-        'signature_label': 6,
-        'dollar_underscore': 5,
-        'square_bracket': 4,
-        'double_curly': 3,
-        'single_curly': 2,
-        'underscore': 1,
-    }
-
     underscore_counter = 0
 
     def collect_candidates(text: str, locator: str) -> list:
@@ -486,8 +494,8 @@ def detect_placeholders_with_context(docx_path: str) -> Dict[str, any]:
             return collected
         t = text
         # Pattern-based
-        for pattern, pattern_type in patterns:
-            for m in re.finditer(pattern, t):
+        for regex, pattern_type in _CONTEXT_PATTERNS:
+            for m in regex.finditer(t):
                 start, end = m.start(), m.end()
                 length = end - start
                 original = m.group(0)
@@ -499,15 +507,14 @@ def detect_placeholders_with_context(docx_path: str) -> Dict[str, any]:
                     'end': end,
                     'length': length,
                     'kind': pattern_type,
-                    'priority': priority_map[pattern_type],
+                    'priority': _PRIORITY_MAP[pattern_type],
                     'original': original,
                     'captured': captured,
                     'locator': locator,
                     'text': t,
                 })
         # Signature-line heuristic
-        sig_re = re.compile(r'^\s*(Address|Email|E-mail|Phone|Name|Title)\s*:?\s*([ \t\._\-—]*)$', re.IGNORECASE)
-        m = sig_re.match(t or '')
+        m = _SIGNATURE_LINE_RE.match(t or '')
         if m:
             remainder = m.group(2) or ''
             if not re.search(r'[A-Za-z0-9]', remainder):
@@ -516,7 +523,7 @@ def detect_placeholders_with_context(docx_path: str) -> Dict[str, any]:
                     'end': len(t),
                     'length': len(t),
                     'kind': 'signature_label',
-                    'priority': priority_map['signature_label'],
+                    'priority': _PRIORITY_MAP['signature_label'],
                     'original': t.strip(),
                     'captured': m.group(1),
                     'locator': locator,
@@ -4,15 +4,33 @@ Unit tests for document replacement functionality
 
 import pytest
 import os
+import re
 import tempfile
+import zipfile
 from pathlib import Path
+from docx import Document
+from docx.shared import RGBColor
 from lib.document_replacer import (
     get_normalized_placeholder_name,
+    replace_placeholders,
+    replace_placeholders_batch,
     validate_document_path,
     DocumentReplacementError
 )
 
 
+def _fill_paragraphs(tmp_path, paragraphs, values, overrides=None):
+    """Build a .docx from paragraph texts, run replacement, return resulting texts."""
+    input_path = str(tmp_path / 'input.docx')
+    output_path = str(tmp_path / 'output.docx')
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    doc.save(input_path)
+    replace_placeholders(input_path, output_path, values, overrides)
+    return [p.text for p in Document(output_path).paragraphs]
+
+
 @pytest.mark.unit
 class TestPlaceholderNormalization:
     """Test placeholder name normalization for document replacement."""
@@ -120,6 +138,252 @@ class TestDocumentReplacement:
         pass
 
 
+@pytest.mark.unit
+class TestOverlappingPatterns:
+    """Test that each placeholder is matched by exactly one pattern."""
+
+    def test_double_curly_not_also_single_curly(self, tmp_path):
+        """{{X}} is replaced once, not again as the inner {X}."""
+        texts = _fill_paragraphs(tmp_path, ['Company: {{Company Name}} and {client}.'],
+                                 {'company_name': 'Acme', 'client': 'Carl'})
+        assert texts == ['Company: Acme and Carl.']
+
+    def test_dollar_underscore_not_also_underscore(self, tmp_path):
+        """$[___] is replaced as a whole, not again as a bare blank."""
+        texts = _fill_paragraphs(tmp_path, ['Price of $[_____] (the "Purchase Amount") due.'],
+                                 {'purchase_amount': '$500', 'field_1': 'WRONG'})
+        assert texts == ['Price of $500 (the "Purchase Amount") due.']
+
+    def test_unclosed_brace_before_long_blank_is_linear(self, tmp_path):
+        """An unclosed '{' before a long whitespace run must not backtrack catastrophically."""
+        text = '{' + ' ' * 5000 + 'and {{CLIENT}}'
+        texts = _fill_paragraphs(tmp_path, [text], {'client': 'Carl'})
+        assert texts == ['{' + ' ' * 5000 + 'and Carl']
+
+    def test_unlabelled_amounts_are_numbered_after_existing_amount_keys(self, tmp_path):
+        """Bare $[___] blanks become amount_N, counting amount_* keys seen before them."""
+        texts = _fill_paragraphs(tmp_path, ['{amount_total}', '$[_____]', '$[_____]'],
+                                 {'amount_total': 'T', 'amount_2': 'B', 'amount_3': 'C'})
+        assert texts == ['T', 'B', 'C']
+
+
+@pytest.mark.unit
+class TestRunLevelReplacement:
+    """Test that replacement edits runs in place when possible."""
+
+    def test_placeholders_within_runs_keep_run_formatting(self, tmp_path):
+        """Each run keeps its own formatting when placeholders do not cross runs."""
+        input_path = str(tmp_path / 'input.docx')
+        output_path = str(tmp_path / 'output.docx')
+        doc = Document()
+        paragraph = doc.add_paragraph()
+        paragraph.add_run('Company: {{COMPANY_NAME}}, ').bold = True
+        paragraph.add_run('signed by [Party Name].').italic = True
+        doc.save(input_path)
+
+        replace_placeholders(input_path, output_path, {'company_name': 'Acme', 'party_name': 'Bob'})
+
+        runs = Document(output_path).paragraphs[0].runs
+        assert [(r.text, r.bold, r.italic) for r in runs] == [
+            ('Company: Acme, ', True, None),
+            ('signed by Bob.', None, True),
+        ]
+
+    def test_placeholder_split_across_runs_is_replaced(self, tmp_path):
+        """A placeholder straddling two runs falls back to a single merged run."""
+        input_path = str(tmp_path / 'input.docx')
+        output_path = str(tmp_path / 'output.docx')
+        doc = Document()
+        paragraph = doc.add_paragraph()
+        paragraph.add_run('Hello {{CLIENT_')
+        paragraph.add_run('NAME}}, welcome.')
+        doc.save(input_path)
+
+        replace_placeholders(input_path, output_path, {'client_name': 'Carl'})
+
+        assert Document(output_path).paragraphs[0].text == 'Hello Carl, welcome.'
+
+    def test_merged_run_keeps_all_first_run_properties(self, tmp_path):
+        """The merged run copies the first run's properties, including colour."""
+        input_path = str(tmp_path / 'input.docx')
+        output_path = str(tmp_path / 'output.docx')
+        doc = Document()
+        paragraph = doc.add_paragraph()
+        first = paragraph.add_run('Hello {{CLIENT_')
+        first.bold = True
+        first.font.color.rgb = RGBColor(0xFF, 0x00, 0x00)
+        paragraph.add_run('NAME}}, welcome.')
+        doc.save(input_path)
+
+        replace_placeholders(input_path, output_path, {'client_name': 'Carl'})
+
+        runs = Document(output_path).paragraphs[0].runs
+        assert len(runs) == 1
+        assert runs[0].text == 'Hello Carl, welcome.'
+        assert runs[0].bold is True
+        assert runs[0].font.color.rgb == RGBColor(0xFF, 0x00, 0x00)
+
+    def test_paragraph_without_placeholder_characters_is_untouched(self, tmp_path):
+        """Plain prose keeps its runs even when other paragraphs are filled."""
+        input_path = str(tmp_path / 'input.docx')
+        output_path = str(tmp_path / 'output.docx')
+        doc = Document()
+        doc.add_paragraph('Client: {client}')
+        prose = doc.add_paragraph()
+        prose.add_run('The fee is $500 ').bold = True
+        prose.add_run('payable on signing.')
+        doc.save(input_path)
+
+        replace_placeholders(input_path, output_path, {'client': 'Carl'})
+
+        paragraphs = Document(output_path).paragraphs
+        assert paragraphs[0].text == 'Client: Carl'
+        assert [(r.text, r.bold) for r in paragraphs[1].runs] == [
+            ('The fee is $500 ', True),
+            ('payable on signing.', None),
+        ]
+
+
+@pytest.mark.unit
+class TestPreScan:
+    """Test the raw-XML pre-scan that copies documents with nothing to replace."""
+
+    def _rebind_prefix(self, path, prefix):
+        """Rewrite word/document.xml so WordprocessingML uses another namespace prefix."""
+        with zipfile.ZipFile(path) as package:
+            parts = {name: package.read(name) for name in package.namelist()}
+        xml = parts['word/document.xml'].decode('utf-8')
+        xml = re.sub(r'(</?|\s)w:', rf'\g<1>{prefix}:', xml).replace('xmlns:w=', f'xmlns:{prefix}=')
+        parts['word/document.xml'] = xml.encode('utf-8')
+        with zipfile.ZipFile(path, 'w') as package:
+            for name, data in parts.items():
+                package.writestr(name, data)
+
+    def test_non_w_prefix_is_still_replaced(self, tmp_path):
+        """Placeholders are found when the namespace is bound to a prefix other than w."""
+        input_path = str(tmp_path / 'input.docx')
+        output_path = str(tmp_path / 'output.docx')
+        doc = Document()
+        doc.add_paragraph('Client: {client}')
+        doc.save(input_path)
+        self._rebind_prefix(input_path, 'wp1')
+
+        replace_placeholders(input_path, output_path, {'client': 'Carl'})
+
+        assert [p.text for p in Document(output_path).paragraphs] == ['Client: Carl']
+
+    def test_document_without_placeholders_is_copied(self, tmp_path):
+        """A document with no placeholder characters is copied byte for byte."""
+        input_path = tmp_path / 'input.docx'
+        output_path = tmp_path / 'output.docx'
+        doc = Document()
+        doc.add_paragraph('Plain text only.')
+        doc.save(str(input_path))
+
+        replace_placeholders(str(input_path), str(output_path), {'client': 'Carl'})
+
+        assert output_path.read_bytes() == input_path.read_bytes()
+
+
+@pytest.mark.unit
+class TestSignatureLabels:
+    """Test filling of bare signature labels."""
+
+    def test_bare_labels_are_filled(self, tmp_path):
+        """A paragraph ending with a known label gets the value appended."""
+        texts = _fill_paragraphs(tmp_path, ['Address:', 'By: {{Signer}} Email:', 'Notes:'],
+                                 {'address': '1 Main St', 'signer': 'Ann', 'email': 'ann@example.com'})
+        assert texts == ['Address: 1 Main St', 'By: Ann Email: ann@example.com', 'Notes:']
+
+    def test_labels_in_table_cells_are_filled(self, tmp_path):
+        """Signature labels inside table cells are filled as well."""
+        input_path = str(tmp_path / 'input.docx')
+        output_path = str(tmp_path / 'output.docx')
+        doc = Document()
+        doc.add_table(rows=1, cols=1).cell(0, 0).text = 'Title:'
+        doc.save(input_path)
+
+        replace_placeholders(input_path, output_path, {'title': 'CEO'})
+
+        assert Document(output_path).tables[0].cell(0, 0).text == 'Title: CEO'
+
+
+@pytest.mark.unit
+class TestOverrides:
+    """Test per-instance overrides."""
+
+    def test_override_replaces_only_its_instance(self, tmp_path):
+        """An override applies to one span; other instances use the shared value."""
+        texts = _fill_paragraphs(tmp_path, ['{x} and {x}'], {'x': 'shared'},
+                                 {'p0-s8-e11': {'answer': 'special'}})
+        assert texts == ['shared and special']
+
+    def test_override_without_answer_is_ignored(self, tmp_path):
+        """Overrides with an empty answer fall back to the shared value."""
+        texts = _fill_paragraphs(tmp_path, ['{x}'], {'x': 'shared'},
+                                 {'p0-s0-e3': {'answer': ''}, 'not-an-instance-id': {'answer': 'y'}})
+        assert texts == ['shared']
+
+
+@pytest.mark.unit
+class TestTableTraversal:
+    """Test that table cells are visited with detection's locators."""
+
+    @pytest.mark.parametrize('merge', [False, True])
+    def test_override_locators_in_tables(self, tmp_path, merge):
+        """Per-instance overrides address table cells by row and grid column."""
+        input_path = str(tmp_path / 'input.docx')
+        output_path = str(tmp_path / 'output.docx')
+        doc = Document()
+        table = doc.add_table(rows=2, cols=3)
+        if merge:
+            table.cell(0, 0).merge(table.cell(0, 1))
+        table.cell(1, 2).text = '{x}'
+        doc.save(input_path)
+
+        overrides = {'t0-r1-c2-p0-s0-e3': {'answer': 'override'}}
+        replace_placeholders(input_path, output_path, {'x': 'value'}, overrides)
+
+        assert Document(output_path).tables[0].cell(1, 2).text == 'override'
+
+
+@pytest.mark.unit
+class TestBatchReplacement:
+    """Test filling several documents at once."""
+
+    def _write(self, path, text):
+        doc = Document()
+        doc.add_paragraph(text)
+        doc.save(path)
+
+    def test_batch_fills_each_document_in_order(self, tmp_path):
+        """Each job is filled with its own values and outputs keep job order."""
+        jobs = []
+        for i in range(3):
+            input_path = str(tmp_path / f'input{i}.docx')
+            self._write(input_path, 'Dear {{Client Name}},')
+            jobs.append((input_path, str(tmp_path / f'output{i}.docx'), {'client_name': f'Client {i}'}))
+
+        outputs = replace_placeholders_batch(jobs, max_workers=2)
+
+        assert outputs == [job[1] for job in jobs]
+        assert [Document(path).paragraphs[0].text for path in outputs] == [
+            'Dear Client 0,', 'Dear Client 1,', 'Dear Client 2,'
+        ]
+
+    def test_batch_raises_replacement_error(self, tmp_path):
+        """A failing document surfaces as DocumentReplacementError."""
+        good = str(tmp_path / 'good.docx')
+        self._write(good, '{x}')
+        jobs = [
+            (good, str(tmp_path / 'out_good.docx'), {'x': '1'}),
+            (str(tmp_path / 'missing.docx'), str(tmp_path / 'out_missing.docx'), {'x': '1'}),
+        ]
+
+        with pytest.raises(DocumentReplacementError):
+            replace_placeholders_batch(jobs, max_workers=2)
+
+
 # Note: Full document replacement tests require actual .docx test fixtures
 # These would be integration tests that:
 # 1. Create a sample .docx with various placeholders and formatting
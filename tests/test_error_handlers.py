@@ -0,0 +1,205 @@
+"""
+Unit tests for error handling utilities
+"""
+
+import zipfile
+import pytest
+from flask import Flask, jsonify
+from lib.error_handlers import (
+    ERROR_MESSAGES, FileValidationError, LLMError, SessionExpiredError, get_error_response, handle_docx_error,
+    register_error_handlers, validate_docx_file
+)
+
+
+@pytest.mark.unit
+class TestHandleDocxError:
+    """Test mapping of .docx processing exceptions to error responses."""
+
+    @pytest.mark.parametrize('message, status_code, title', [
+        ('File is not a zip file', 400, 'Invalid Document Format'),
+        ('[Errno 2] No such file or directory', 404, 'File Not Found'),
+        ('Archive is corrupted', 400, 'Malformed Document'),
+        ('Document is empty', 400, 'Empty Document'),
+        ('[Errno 13] Permission denied', 500, 'Processing Failed'),
+        ('Something unexpected', 400, 'Processing Failed'),
+    ])
+    def test_error_classification(self, app, message, status_code, title):
+        """Exception messages map to the expected error type and status."""
+        with app.app_context():
+            response, status = handle_docx_error(Exception(message))
+
+        assert status == status_code
+        assert response.get_json()['error'] == title
+
+    def test_earlier_rule_wins(self, app):
+        """A message matching several rules uses the first rule in priority order."""
+        with app.app_context():
+            response, status = handle_docx_error(Exception('empty file: not a zip file'))
+
+        assert status == 400
+        assert response.get_json()['error'] == 'Invalid Document Format'
+
+    def test_details_included_for_permission_and_generic_errors(self, app):
+        """Permission and generic errors carry an explanatory details field."""
+        with app.app_context():
+            permission, _ = handle_docx_error(Exception('Permission denied'))
+            generic, _ = handle_docx_error(Exception('boom'))
+
+        assert permission.get_json()['details'] == 'File access permission error'
+        assert generic.get_json()['details'] == 'Document structure could not be parsed'
+
+
+@pytest.mark.unit
+class TestGetErrorResponse:
+    """Test standardized error responses."""
+
+    @pytest.mark.parametrize('debug', [False, True])
+    def test_static_responses_match_jsonify(self, app, monkeypatch, debug):
+        """Pre-serialized bodies are byte-identical to what jsonify would return."""
+        monkeypatch.setattr(app, 'debug', debug)
+        with app.app_context():
+            for error_type, info in ERROR_MESSAGES.items():
+                response, status = get_error_response(error_type, 418)
+                expected = jsonify({
+                    'success': False,
+                    'error': info['title'],
+                    'message': info['message'],
+                    'suggestion': info['suggestion'],
+                })
+                assert status == 418
+                assert response.mimetype == 'application/json'
+                assert response.get_data() == expected.get_data()
+
+    def test_additional_info_is_merged(self, app):
+        """Additional info is added to the standard fields."""
+        with app.app_context():
+            response, _ = get_error_response('parsing_failed', 400, {'details': 'x'})
+
+        data = response.get_json()
+        assert data['details'] == 'x'
+        assert data['error'] == ERROR_MESSAGES['parsing_failed']['title']
+
+
+@pytest.mark.unit
+class TestValidateDocxFile:
+    """Test pre-processing validation of uploaded .docx files."""
+
+    def _status(self, app, path):
+        with app.app_context():
+            is_valid, error = validate_docx_file(str(path))
+        return is_valid, (error[1] if error else None)
+
+    def test_valid_docx(self, app, tmp_path):
+        """A ZIP with the required docx parts is accepted."""
+        path = tmp_path / 'ok.docx'
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('[Content_Types].xml', '<Types/>')
+            zf.writestr('word/document.xml', '<document/>')
+
+        assert self._status(app, path) == (True, None)
+
+    def test_missing_and_empty_files(self, app, tmp_path):
+        """Missing files are 404s and empty files are rejected."""
+        empty = tmp_path / 'empty.docx'
+        empty.write_bytes(b'')
+
+        assert self._status(app, tmp_path / 'missing.docx') == (False, 404)
+        assert self._status(app, empty) == (False, 400)
+
+    def test_non_zip_file_is_invalid(self, app, tmp_path):
+        """A file without the ZIP signature is reported as an invalid document."""
+        path = tmp_path / 'old.docx'
+        path.write_bytes(b'\xd0\xcf\x11\xe0 legacy .doc content')
+
+        with app.app_context():
+            is_valid, (response, status) = validate_docx_file(str(path))
+
+        assert not is_valid and status == 400
+        assert response.get_json()['error'] == 'Invalid Document Format'
+
+    def test_zip_without_document_part_is_malformed(self, app, tmp_path):
+        """A ZIP missing word/document.xml is reported as malformed."""
+        path = tmp_path / 'partial.docx'
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('[Content_Types].xml', '<Types/>')
+
+        with app.app_context():
+            is_valid, (response, status) = validate_docx_file(str(path))
+
+        assert not is_valid and status == 400
+        assert response.get_json()['error'] == 'Malformed Document'
+
+    def test_unknown_error_type_uses_default_message(self, app):
+        """Unknown error types fall back to the generic message."""
+        with app.app_context():
+            response, status = get_error_response('no_such_type', 500)
+
+        assert status == 500
+        assert response.get_json()['error'] == 'Error'
+
+    def test_empty_zip_is_malformed(self, app, tmp_path):
+        """A ZIP with no entries is a malformed document, not an invalid format."""
+        path = tmp_path / 'empty-archive.docx'
+        with zipfile.ZipFile(path, 'w'):
+            pass
+
+        with app.app_context():
+            is_valid, (response, status) = validate_docx_file(str(path))
+
+        assert not is_valid and status == 400
+        assert response.get_json()['error'] == 'Malformed Document'
+
+    def test_revalidates_after_file_changes(self, app, tmp_path):
+        """Cached results are keyed by mtime and size, so a rewritten file is re-checked."""
+        path = tmp_path / 'changing.docx'
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('[Content_Types].xml', '<Types/>')
+            zf.writestr('word/document.xml', '<document/>')
+
+        assert self._status(app, path) == (True, None)
+        assert self._status(app, path) == (True, None)
+
+        path.write_bytes(b'not a zip archive')
+        assert self._status(app, path) == (False, 400)
+
+
+@pytest.mark.unit
+class TestRegisteredHandlers:
+    """Test the Flask error handlers installed by register_error_handlers."""
+
+    @pytest.mark.parametrize('error, status_code, title', [
+        (LLMError('quota exceeded'), 500, 'AI Service Error'),
+        (SessionExpiredError(), 401, 'Session Expired'),
+    ])
+    def test_custom_exceptions_become_json_errors(self, error, status_code, title):
+        """Custom exceptions raised in a view are turned into JSON error responses."""
+        app = Flask(__name__)
+        register_error_handlers(app)
+
+        @app.route('/fail')
+        def fail():
+            raise error
+
+        response = app.test_client().get('/fail')
+
+        assert response.status_code == status_code
+        assert response.get_json()['error'] == title
+
+    @pytest.mark.parametrize('debug', [False, True])
+    def test_file_validation_body_matches_jsonify(self, monkeypatch, debug):
+        """The pre-assembled file validation body is identical to the jsonify output."""
+        app = Flask(__name__)
+        monkeypatch.setattr(app, 'debug', debug)
+        register_error_handlers(app)
+        message = 'Bad "name" \u00e9'
+
+        @app.route('/fail')
+        def fail():
+            raise FileValidationError(message)
+
+        response = app.test_client().get('/fail')
+        with app.app_context():
+            expected = jsonify({'success': False, 'error': 'File Validation Error', 'message': message})
+
+        assert response.status_code == 400
+        assert response.get_data() == expected.get_data()
@@ -0,0 +1,178 @@
+"""
+Unit tests for file cleanup utilities
+"""
+
+import os
+import threading
+import time
+import pytest
+from lib import file_cleanup as file_cleanup_module
+from lib.file_cleanup import FileCleanup, MAX_CLEANUP_ERRORS, schedule_periodic_cleanup
+
+
+def _make_file(folder, name, age_hours=0, size=10):
+    """Create a file of the given size whose mtime is age_hours in the past."""
+    path = folder / name
+    path.write_bytes(b'x' * size)
+    mtime = time.time() - age_hours * 3600
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.mark.unit
+class TestCleanupExpiredFiles:
+    """Test removal of expired files from the upload folder."""
+
+    def test_removes_only_expired_files(self, tmp_path):
+        """Files older than max_age_hours are removed; newer files and folders stay."""
+        old = _make_file(tmp_path, 'old.docx', age_hours=30)
+        new = _make_file(tmp_path, 'new.docx', age_hours=1)
+        (tmp_path / 'subdir').mkdir()
+
+        result = FileCleanup(str(tmp_path)).cleanup_expired_files(max_age_hours=24)
+
+        assert result == {'success': True, 'files_cleaned': 1, 'errors': None, 'errors_truncated': 0}
+        assert not old.exists()
+        assert new.exists()
+        assert (tmp_path / 'subdir').is_dir()
+
+    def test_failed_deletion_is_reported_and_sweep_continues(self, tmp_path, monkeypatch):
+        """A file that cannot be removed is listed in errors; the others are still removed."""
+        locked = _make_file(tmp_path, 'locked.docx', age_hours=30)
+        other = _make_file(tmp_path, 'other.docx', age_hours=30)
+        real_unlink = os.unlink
+
+        def unlink(path, *args, **kwargs):
+            if os.path.basename(path) == 'locked.docx':
+                raise PermissionError('denied')
+            return real_unlink(path, *args, **kwargs)
+
+        monkeypatch.setattr(os, 'unlink', unlink)
+        result = FileCleanup(str(tmp_path)).cleanup_expired_files(max_age_hours=24)
+
+        assert result['files_cleaned'] == 1
+        assert result['errors'] == ['Failed to clean up locked.docx: denied']
+        assert locked.exists()
+        assert not other.exists()
+
+    def test_error_messages_are_capped(self, tmp_path, monkeypatch):
+        """Beyond MAX_CLEANUP_ERRORS failures only a count is kept."""
+        for i in range(MAX_CLEANUP_ERRORS + 3):
+            _make_file(tmp_path, f'f{i}.docx', age_hours=30)
+
+        def unlink(path, *args, **kwargs):
+            raise PermissionError('denied')
+
+        monkeypatch.setattr(os, 'unlink', unlink)
+        result = FileCleanup(str(tmp_path)).cleanup_expired_files(max_age_hours=24)
+
+        assert result['files_cleaned'] == 0
+        assert len(result['errors']) == MAX_CLEANUP_ERRORS
+        assert result['errors_truncated'] == 3
+
+    def test_missing_folder(self, tmp_path):
+        """A missing upload folder is reported without raising."""
+        result = FileCleanup(str(tmp_path / 'missing')).cleanup_expired_files()
+
+        assert result['success'] is False
+        assert result['files_cleaned'] == 0
+
+
+@pytest.mark.unit
+class TestFolderStats:
+    """Test upload folder statistics."""
+
+    def test_counts_files_and_finds_oldest(self, tmp_path):
+        """Stats cover regular files only and report the oldest one."""
+        _make_file(tmp_path, 'a.docx', age_hours=2, size=100)
+        _make_file(tmp_path, 'b.docx', age_hours=5, size=50)
+        (tmp_path / 'subdir').mkdir()
+
+        stats = FileCleanup(str(tmp_path)).get_folder_stats()
+
+        assert stats['exists'] is True
+        assert stats['total_files'] == 2
+        assert stats['total_size_bytes'] == 150
+        assert stats['oldest_file'] == 'b.docx'
+        assert stats['oldest_file_age_hours'] == pytest.approx(5, abs=0.01)
+
+    def test_missing_folder(self, tmp_path):
+        """A missing folder reports exists=False."""
+        stats = FileCleanup(str(tmp_path / 'missing')).get_folder_stats()
+
+        assert stats == {'exists': False, 'total_files': 0, 'total_size_bytes': 0}
+
+
+@pytest.mark.unit
+class TestCleanupOnResponse:
+    """Test deferring file removal until a response is closed."""
+
+    def test_file_removed_when_response_closes(self, app, tmp_path):
+        """The file survives until the response is closed, then is removed."""
+        path = _make_file(tmp_path, 'completed.docx')
+        cleanup = FileCleanup(str(tmp_path))
+
+        response = app.response_class(b'data')
+        assert cleanup.register_cleanup_on_response(response, str(path)) is response
+        assert path.exists()
+
+        response.close()
+        assert not path.exists()
+
+
+class _RecordingCleanup:
+    """Stand-in for the global FileCleanup instance that records scheduled runs."""
+
+    def __init__(self):
+        self.calls = []
+        self.ran = threading.Event()
+
+    def cleanup_expired_files(self, max_age_hours=24):
+        self.calls.append(max_age_hours)
+        self.ran.set()
+        return {'success': True, 'files_cleaned': 0, 'errors': None}
+
+
+@pytest.mark.unit
+class TestScheduledCleanup:
+    """Test the background cleanup task."""
+
+    def test_runs_immediately_and_stops_on_event(self, app, monkeypatch):
+        """The task runs once at start and exits promptly when the stop event is set."""
+        recorder = _RecordingCleanup()
+        monkeypatch.setattr(file_cleanup_module, 'file_cleanup', recorder)
+
+        stop_event = schedule_periodic_cleanup(app, interval_hours=24, max_age_hours=6)
+
+        assert recorder.ran.wait(5)
+        assert app.extensions['file_cleanup_stop'] is stop_event
+        stop_event.set()
+        worker = next(t for t in threading.enumerate() if t.name == 'file-cleanup')
+        worker.join(5)
+        app.extensions.pop('file_cleanup_stop')
+        assert not worker.is_alive()
+        assert recorder.calls == [6]
+
+
+@pytest.mark.unit
+class TestSingleFileCleanup:
+    """Test removal of individual files."""
+
+    def test_cleanup_specific_file(self, tmp_path):
+        """An existing file is removed; a missing one reports False."""
+        path = _make_file(tmp_path, 'upload.docx')
+        cleanup = FileCleanup(str(tmp_path))
+
+        assert cleanup.cleanup_specific_file('upload.docx') is True
+        assert not path.exists()
+        assert cleanup.cleanup_specific_file('upload.docx') is False
+
+    def test_cleanup_file_by_path(self, tmp_path):
+        """Full paths are removed; missing or empty paths report False."""
+        path = _make_file(tmp_path, 'completed.docx')
+        cleanup = FileCleanup(str(tmp_path))
+
+        assert cleanup.cleanup_file_by_path(str(path)) is True
+        assert not path.exists()
+        assert cleanup.cleanup_file_by_path(str(path)) is False
+        assert cleanup.cleanup_file_by_path(None) is False
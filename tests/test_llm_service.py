@@ -3,7 +3,9 @@ Unit tests for LLM service functionality
 """
 
 import pytest
+from collections import deque
 from unittest.mock import patch, MagicMock
+from google.api_core import exceptions as google_exceptions
 from lib.llm_service import (
     generate_question,
     is_llm_enabled,
@@ -104,6 +106,47 @@ class TestQuestionGeneration:
         assert isinstance(question, str)
         assert len(question) > 0
     
+    @pytest.mark.parametrize('placeholder, question', [
+        ('email', 'What is the email address?'),
+        ('client_email', 'What is the email address?'),
+        ('signing_date', 'What is the relevant date? (e.g., January 1, 2024)'),
+        ('Contact-Phone', 'What is the phone number?'),
+    ])
+    @patch('lib.llm_service.is_llm_enabled', return_value=True)
+    @patch('lib.llm_service.check_rate_limit', return_value=(True, 0))
+    @patch('lib.llm_service._generate_with_fallback', return_value=(None, None))
+    def test_keyword_names_skip_llm(self, mock_generate, _mock_rate_limit, _mock_enabled, placeholder, question):
+        """A single keyword with at most one generic qualifier is answered locally."""
+        generate_question.cache_clear()
+
+        assert generate_question(placeholder, use_llm=True) == question
+        mock_generate.assert_not_called()
+
+    @pytest.mark.parametrize('placeholder', [
+        'company_name', 'tenant_name', 'landlord_name', 'effective_date',
+        'termination_fee', 'determination_date', 'entitled_amount',
+        'amount_1', 'client_mailing_address', 'governing_law',
+    ])
+    @patch('lib.llm_service.is_llm_enabled', return_value=True)
+    @patch('lib.llm_service.check_rate_limit', return_value=(True, 0))
+    @patch('lib.llm_service._generate_with_fallback', return_value=(None, None))
+    def test_ambiguous_names_use_llm(self, mock_generate, _mock_rate_limit, _mock_enabled, placeholder):
+        """Names with several keywords, embedded keywords or other words still go to the LLM."""
+        from lib.llm_service import generate_question_from_context
+        generate_question.cache_clear()
+        generate_question_from_context.cache_clear()
+
+        generate_question(placeholder, use_llm=True)
+        generate_question_from_context(placeholder, '')
+
+        assert mock_generate.call_count == 2
+
+    def test_shortcut_qualifiers_contain_no_keywords(self):
+        """Qualifiers never change which keyword question the fallback picks."""
+        from lib.llm_service import _FALLBACK_KEYWORDS, _KEYWORD_SHORTCUT_QUALIFIERS
+        for qualifier in _KEYWORD_SHORTCUT_QUALIFIERS:
+            assert not any(key in qualifier for key in _FALLBACK_KEYWORDS)
+
     def test_caching_behavior(self):
         """Test that repeated calls for same placeholder use cache."""
         placeholder = "COMPANY_NAME"
@@ -149,6 +192,103 @@ class TestRateLimiting:
             record_request()
             assert check_rate_limit() is True
 
+    def test_window_blocks_at_limit_and_expires(self, monkeypatch):
+        """Requests older than a minute no longer count against the limit."""
+        from lib import llm_service
+        monkeypatch.setitem(llm_service._rate_limit_tracker, 'requests', deque())
+        clock = [1000.0]
+        monkeypatch.setattr(llm_service.time, 'monotonic', lambda: clock[0])
+
+        for _ in range(llm_service._rate_limit_tracker['max_per_minute']):
+            record_request()
+        assert check_rate_limit() == (False, 61)
+
+        clock[0] += 30
+        assert check_rate_limit() == (False, 31)
+
+        clock[0] += 30
+        assert check_rate_limit() == (True, 0)
+
+    def test_acquire_slot_records_only_when_allowed(self, monkeypatch):
+        """acquire_request_slot counts admitted requests and leaves the window alone when refused."""
+        from lib import llm_service
+        requests = deque()
+        monkeypatch.setitem(llm_service._rate_limit_tracker, 'requests', requests)
+        limit = llm_service._rate_limit_tracker['max_per_minute']
+
+        results = [llm_service.acquire_request_slot()[0] for _ in range(limit + 2)]
+
+        assert results == [True] * limit + [False, False]
+        assert len(requests) == limit
+
+
+@pytest.mark.unit
+class TestGenerationRetries:
+    """Test retry and model fallback around Gemini calls."""
+
+    @patch('lib.llm_service._TRANSIENT_ERRORS', (google_exceptions.DeadlineExceeded, google_exceptions.ServiceUnavailable))
+    @patch('lib.llm_service.time.sleep')
+    @patch('lib.llm_service.acquire_request_slot', return_value=(True, 0))
+    @patch('lib.llm_service.get_model')
+    def test_transient_error_is_retried_on_same_model(self, mock_get_model, _mock_rate_limit, mock_sleep):
+        """A deadline error is retried with backoff before trying the fallback model."""
+        from lib.llm_service import _generate_with_fallback, MODEL_NAME
+        model = MagicMock()
+        model.generate_content.side_effect = [google_exceptions.DeadlineExceeded('slow'), 'response']
+        mock_get_model.return_value = model
+
+        assert _generate_with_fallback('prompt', {}, 3) == ('response', MODEL_NAME)
+        assert model.generate_content.call_count == 2
+        assert mock_sleep.call_count == 1
+
+    @patch('lib.llm_service.time.sleep')
+    @patch('lib.llm_service.acquire_request_slot', return_value=(True, 0))
+    @patch('lib.llm_service.get_model')
+    def test_other_errors_move_to_next_model(self, mock_get_model, _mock_slot, mock_sleep):
+        """Non-transient errors are not retried on the same model."""
+        from lib.llm_service import _generate_with_fallback, _MODEL_SEQUENCE
+        model = MagicMock()
+        model.generate_content.side_effect = ValueError('bad request')
+        mock_get_model.return_value = model
+
+        assert _generate_with_fallback('prompt', {}, 3) == (None, None)
+        assert model.generate_content.call_count == len(_MODEL_SEQUENCE)
+        mock_sleep.assert_not_called()
+
+    @patch('lib.llm_service.acquire_request_slot', return_value=(False, 12))
+    @patch('lib.llm_service.get_model')
+    def test_stops_when_rate_limited(self, mock_get_model, _mock_slot):
+        """No request is sent once the rate limit refuses a slot."""
+        from lib.llm_service import _generate_with_fallback
+        model = MagicMock()
+        mock_get_model.return_value = model
+
+        assert _generate_with_fallback('prompt', {}, 3) == (None, None)
+        model.generate_content.assert_not_called()
+
+    @patch('lib.llm_service._TRANSIENT_ERRORS', (google_exceptions.DeadlineExceeded, google_exceptions.ServiceUnavailable))
+    @patch('lib.llm_service.time.sleep')
+    @patch('lib.llm_service.acquire_request_slot', return_value=(True, 0))
+    @patch('lib.llm_service.get_model')
+    def test_timeout_bounds_all_attempts(self, mock_get_model, _mock_slot, _mock_sleep, monkeypatch):
+        """Retries get only the remaining time, and the fallback model is skipped once it runs out."""
+        from lib import llm_service
+        clock = [100.0]
+        monkeypatch.setattr(llm_service.time, 'monotonic', lambda: clock[0])
+        timeouts = []
+
+        def generate_content(prompt, generation_config, request_options):
+            timeouts.append(request_options['timeout'])
+            clock[0] += 4 if len(timeouts) == 1 else request_options['timeout']
+            raise google_exceptions.DeadlineExceeded('slow')
+
+        model = MagicMock()
+        model.generate_content.side_effect = generate_content
+        mock_get_model.return_value = model
+
+        assert llm_service._generate_with_fallback('prompt', {}, 10) == (None, None)
+        assert timeouts == [10, 6]
+
 
 @pytest.mark.unit
 class TestBatchQuestionGeneration:
@@ -189,6 +329,32 @@ class TestBatchQuestionGeneration:
         except ImportError:
             pytest.skip("Batch generation not implemented")
 
+    @patch('lib.llm_service.is_llm_enabled', return_value=True)
+    @patch('lib.llm_service.check_rate_limit', return_value=(True, 0))
+    @patch('lib.llm_service._generate_with_fallback')
+    def test_batch_response_parsing(self, mock_generate, _mock_rate_limit, _mock_enabled):
+        """Numbered lines map back to placeholders; gaps and bad lines fall back."""
+        from lib.llm_service import generate_questions_batch
+        response = MagicMock(candidates=[])
+        response.text = (
+            "Here are the questions:\n"
+            "1. What is the company name\n"
+            "  2) \"When is the contract dated?\"\n"
+            "2) Ignored duplicate?\n"
+            "4 - Unused extra question?\n"
+        )
+        mock_generate.return_value = (response, 'test-model')
+
+        questions = generate_questions_batch(['company_name', 'contract_date', 'company_name', 'client_address'])
+
+        assert questions == {
+            'company_name': 'What is the company name?',
+            'contract_date': 'When is the contract dated?',
+            'client_address': 'Please provide: Client Address',
+        }
+        prompt = mock_generate.call_args[0][0]
+        assert '3. client_address' in prompt and '4.' not in prompt
+
     def test_generate_questions_for_candidates_fallback(self):
         """Batch helper returns fallback structure when LLM disabled."""
         items = [{